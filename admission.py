@@ -0,0 +1,226 @@
+"""
+admission.py - Admission control, backpressure and rate limiting for the API.
+
+Every scrape launches a Chromium instance; accepting unbounded work makes the
+container OOM under a traffic spike. This module puts a bounded queue in front
+of the scrape phase and token-bucket rate limits per client and per (hashed)
+Gemini key. When the queue is full the API answers 429 with Retry-After
+immediately instead of piling more browsers onto the executor.
+
+Usage:
+    controller = AdmissionController()
+    client = client_id(request.client.host, request.headers.get("x-forwarded-for", ""))
+    controller.check_rate(client, gemini_key)      # raises Rejected
+    async with controller.slot():                  # raises Rejected
+        ...scrape...
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+MAX_ACTIVE_SCRAPES = int(os.getenv("MAX_ACTIVE_SCRAPES", "2"))    # Concurrent browsers
+MAX_QUEUED_SCRAPES = int(os.getenv("MAX_QUEUED_SCRAPES", "8"))    # Waiting behind them
+MAX_QUEUE_WAIT = float(os.getenv("MAX_QUEUE_WAIT", "60"))         # Seconds before giving up
+
+CLIENT_RATE_PER_MIN = float(os.getenv("CLIENT_RATE_PER_MIN", "10"))
+CLIENT_BURST = int(os.getenv("CLIENT_BURST", "5"))
+KEY_RATE_PER_MIN = float(os.getenv("KEY_RATE_PER_MIN", "20"))
+KEY_BURST = int(os.getenv("KEY_BURST", "5"))
+
+# Reverse proxies in front of the API that append to X-Forwarded-For. The client
+# address is the entry the outermost trusted proxy added; anything left of it is
+# client-supplied. Render runs one proxy; direct exposure = 0 (header ignored).
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1" if os.getenv("RENDER") else "0"))
+
+# Server-side key that BYOK-less requests fall back to (rate limited like any other key)
+SERVER_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Idle buckets are dropped once the table grows past this many entries
+MAX_BUCKETS = 10_000
+
+
+class Rejected(Exception):
+    """Request refused by admission control. Maps to HTTP 429 / 503 + Retry-After."""
+
+    def __init__(self, reason: str, retry_after: float, status_code: int = 429):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status_code = status_code
+
+
+# ── TOKEN BUCKETS ────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec refill, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume one token. Returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class RateLimiter:
+    """One token bucket per key (client IP, hashed API key, ...)."""
+
+    def __init__(self, rate_per_min: float, burst: int):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._evict_idle()
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            return bucket.take()
+
+    def _evict_idle(self):
+        """Drop buckets that have refilled completely — they hold no state worth keeping."""
+        now = time.monotonic()
+        full_after = self.burst / self.rate if self.rate > 0 else 0
+        self._buckets = {k: b for k, b in self._buckets.items() if now - b.updated < full_after}
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def hash_key(api_key: str) -> str:
+    """Bucket id for a Gemini key — the raw key is never stored or logged."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def client_id(remote_addr: str, forwarded_for: str = "", trusted_hops: int = TRUSTED_PROXY_HOPS) -> str:
+    """
+    Caller identity for rate limiting. X-Forwarded-For is only trusted for the
+    hops our own proxies added: with N trusted proxies the client is the Nth
+    entry from the right. Shorter headers (or hops=0) fall back to the socket peer.
+    """
+    hops = [h.strip() for h in forwarded_for.split(",") if h.strip()]
+    if trusted_hops > 0 and len(hops) >= trusted_hops:
+        return hops[-trusted_hops]
+    return remote_addr or "unknown"
+
+
+# ── ADMISSION CONTROLLER ─────────────────────────────────────────────────────
+
+class AdmissionController:
+    """
+    Bounded queue in front of the scrape phase + per-client / per-key rate limits.
+    Exposes counters via .stats() for the /api/metrics endpoint.
+    """
+
+    def __init__(
+        self,
+        max_active: int = MAX_ACTIVE_SCRAPES,
+        max_queued: int = MAX_QUEUED_SCRAPES,
+        max_wait: float = MAX_QUEUE_WAIT,
+    ):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.client_limiter = RateLimiter(CLIENT_RATE_PER_MIN, CLIENT_BURST)
+        self.key_limiter = RateLimiter(KEY_RATE_PER_MIN, KEY_BURST)
+
+        self._semaphore = None  # Created lazily inside the running event loop
+        self.active = 0
+        self.queued = 0
+        self.avg_service_time = 20.0  # EWMA seconds per scrape, seeded with a typical page
+        self.counters = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "rejected_client_rate": 0,
+            "rejected_key_rate": 0,
+        }
+
+    def check_rate(self, client_id: str, api_key: str = None):
+        """Token-bucket check for the client and the Gemini key actually used (BYOK or the server key)."""
+        self.check_client(client_id)
+        self.check_key(api_key)
+
+    def check_client(self, client_id: str):
+        """Charge one token to the client bucket."""
+        wait = self.client_limiter.take(client_id or "unknown")
+        if wait:
+            self.counters["rejected_client_rate"] += 1
+            raise Rejected("Rate limit exceeded for this client. Please slow down.", wait)
+
+    def check_key(self, api_key: str = None):
+        """Charge one token to the key bucket — BYOK key, else the server's GEMINI_API_KEY."""
+        key = api_key or SERVER_API_KEY
+        if not key:
+            return
+        wait = self.key_limiter.take(hash_key(key))
+        if wait:
+            self.counters["rejected_key_rate"] += 1
+            raise Rejected("Rate limit exceeded for this API key. Please slow down.", wait)
+
+    def _estimated_wait(self) -> float:
+        """Rough time until a new request would start: queue ahead / parallelism × service time."""
+        return (self.queued / max(1, self.max_active) + 1) * self.avg_service_time
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one scrape slot for the duration of the block; reject fast when the queue is full."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_active)
+
+        if self.active + self.queued >= self.max_active + self.max_queued:
+            self.counters["rejected_queue_full"] += 1
+            raise Rejected("Server is at capacity. Please retry shortly.", self._estimated_wait())
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.counters["rejected_queue_timeout"] += 1
+            raise Rejected("Timed out waiting for a free scrape slot.", self._estimated_wait(), status_code=503)
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        self.counters["admitted"] += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * (time.monotonic() - start)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "maxActive": self.max_active,
+            "maxQueued": self.max_queued,
+            "avgServiceTime": round(self.avg_service_time, 2),
+            "trackedClients": len(self.client_limiter),
+            "trackedKeys": len(self.key_limiter),
+            **self.counters,
+        }
@@ -5,10 +5,14 @@ backward-compatible entry points for the API server.
 """
 
 from gemini_organizer import GeminiOrganizer, OrganizedResult
+from change_detector import ChangeDetector
 
 # Singleton organizer instance
 _organizer = GeminiOrganizer()
 
+# Created on first incremental call so plain scrapes never touch the fingerprint DB
+_detector = None
+
 
 def extract_structured(html_text: str, api_key: str = None, source_url: str = "") -> OrganizedResult:
     """
@@ -19,6 +23,43 @@ def extract_structured(html_text: str, api_key: str = None, source_url: str = ""
     return _organizer.organize(html_text, api_key=api_key, source_url=source_url)
 
 
+def extract_incremental(html_text: str, api_key: str = None, source_url: str = "") -> OrganizedResult:
+    """
+    Like extract_structured, but skips Gemini when the page fingerprint is unchanged.
+    The result carries .change_status ("new" | "unchanged" | "changed") and,
+    when changed, a row-level .diff per category.
+    """
+    global _detector
+    if _detector is None:
+        _detector = ChangeDetector()
+    return _detector.extract(
+        html_text,
+        source_url,
+        lambda: _organizer.organize(html_text, api_key=api_key, source_url=source_url),
+    )
+
+
+def organizer_stats() -> dict:
+    """Counters from the shared organizer (prompt cache, hedge wins) for /api/metrics."""
+    return {
+        "promptCache": dict(_organizer.prompt_cache.stats),
+        "hedging": _organizer.hedge.snapshot() if _organizer.hedging else None,
+    }
+
+
+def organizer_counters() -> dict:
+    """Raw cumulative counters only — what pool workers report back to be summed."""
+    return {
+        "promptCache": dict(_organizer.prompt_cache.stats),
+        "hedging": dict(_organizer.hedge.stats) if _organizer.hedging else {},
+    }
+
+
+def prewarm() -> bool:
+    """Warm the shared organizer (genai client + cached prompt prefix) before the first request."""
+    return _organizer.prewarm()
+
+
 # Legacy helpers (kept for backward compatibility with test scripts)
 def extract_multi_entity(html_text: str) -> dict:
     """Returns just the data dict (no schema). Used by test2.py."""
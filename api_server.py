@@ -1,23 +1,89 @@
-from fastapi import FastAPI, HTTPException
+import startup  # First: starts the process clock for startup timings
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import asyncio
 from datetime import datetime
-import json
 import traceback
+from contextlib import asynccontextmanager
+import importlib
 import os
+import re
 import sys
-import scraper
-import ai_agent
-from fastapi.responses import JSONResponse
+from urllib.parse import quote
+import admission
+import exporter
+import fast_json
+import hedging
+import snapshot_store
+from worker_pool import WorkerPool, WorkerError, TASKS, add_counters
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # Fix for Windows console emoji printing
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
 
-app = FastAPI(title="NEXUS SCRAPER API", version="3.0.0")
+# Heavy modules load on first use so `/` answers within the platform's health-check
+# window on a cold start: scraper (DrissionPage + bs4) and ai_agent (google-genai)
+# are resolved through worker_pool.TASKS in _offload; structured_data via a proxy.
+structured_data = startup.LazyModule("structured_data")
+
+# Readiness + startup timings (see /api/ready)
+startup_state = startup.StartupState()
+PREWARM = startup.PREWARM
+
+# Bounded scrape queue + per-client / per-key token buckets
+admission_controller = admission.AdmissionController()
+
+# Archive read by /api/reextract (index opened on first use)
+snapshots = snapshot_store.SnapshotStore()
+
+# Parallel Gemini calls per /api/reextract batch
+REEXTRACT_CONCURRENCY = int(os.environ.get("REEXTRACT_CONCURRENCY", "4"))
+# Most snapshots one /api/reextract call may re-run (each is charged to the key bucket)
+MAX_REEXTRACT_BATCH = int(os.environ.get("MAX_REEXTRACT_BATCH", "100"))
+
+# Supervisor mode: N isolated worker processes own the browsers (0 = run in-process)
+WORKER_TASKS = {"scrape", "prewarm"}
+WORKERS = int(os.environ.get("NEXUS_WORKERS", "0"))
+worker_pool = None
+
+
+def _prewarm() -> dict:
+    """Warm-up body (background thread): in-process, or browsers in each worker + Gemini here."""
+    if not worker_pool:
+        timings = startup.prewarm_worker()
+        structured_data.preload()
+        return timings
+    # Workers only scrape; extraction (and so the genai client) lives in this process
+    futures = [worker_pool.submit("prewarm", startup.PREWARM_BROWSER, False) for _ in range(worker_pool.size)]
+    timings = startup.prewarm_worker(browser=False, scraper=False)
+    structured_data.preload()
+    for i, future in enumerate(futures):
+        for phase, seconds in future.result().items():
+            timings[f"worker{i}.{phase}"] = seconds
+    return timings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global worker_pool
+    if WORKERS > 0:
+        worker_pool = WorkerPool(size=WORKERS)
+        worker_pool.start()
+        # One browser per worker — let the admission queue feed all of them
+        admission_controller.max_active = max(admission_controller.max_active, WORKERS)
+    if PREWARM:
+        startup_state.warm_up(_prewarm)
+    yield
+    if worker_pool:
+        worker_pool.stop()
+        worker_pool = None
+
+
+app = FastAPI(title="NEXUS SCRAPER API", version="3.0.0", lifespan=lifespan)
 
 # CORS — explicit origins (wildcard + credentials = blocked by browsers)
 app.add_middleware(
@@ -37,6 +103,10 @@ class ScraperConfig(BaseModel):
     geminiParsing: bool = True
     deepScroll: bool = False
     extraction_mode: str = "html"  # "html" or "network"
+    incremental: bool = False  # Skip Gemini when the page fingerprint is unchanged
+    structuredFastPath: bool = True  # Skip Gemini when JSON-LD / microdata is rich enough
+    structuredSingleEntity: bool = False  # Let one Product / Article row count as rich (page metadata only)
+    snapshot: bool = False  # Archive raw/cleaned HTML + API data for /api/reextract
 
 
 class ScrapeRequest(BaseModel):
@@ -45,6 +115,18 @@ class ScrapeRequest(BaseModel):
     geminiKey: str = None  # BYOK: user-provided Gemini API key
 
 
+class ExportRequest(ScrapeRequest):
+    format: str = "csv"  # "csv" | "ndjson" | "parquet"
+    category: Optional[str] = None  # Required for multi-category CSV/Parquet (defaults to the first)
+
+
+class ReextractRequest(BaseModel):
+    urls: List[str] = Field(default_factory=list, max_length=MAX_REEXTRACT_BATCH)  # Latest snapshot of each; empty = every archived URL
+    since: Optional[str] = None  # ISO timestamp — only snapshots captured after this
+    limit: int = Field(50, ge=1, le=MAX_REEXTRACT_BATCH)  # All-URLs mode only; `urls` is capped by max_length
+    geminiKey: str = None
+
+
 # ── Endpoints ────────────────────────────────────────────────────────────────
 
 @app.get("/")
@@ -52,6 +134,12 @@ class ScrapeRequest(BaseModel):
 async def root():
     return {"status": "alive"}
 
+@app.get("/api/ready")
+async def ready():
+    """Readiness (separate from liveness `/`): 503 until the optional warm-up has finished."""
+    state = startup_state.snapshot()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
 @app.get("/api/health")
 async def health_check():
     return {
@@ -62,82 +150,297 @@ async def health_check():
     }
 
 
-@app.post("/api/scrape")
-async def scrape_url(request: ScrapeRequest):
-    print(f"\n{'='*60}")
-    print(f"[API] Scrape request: {request.url}")
-    print(f"[API] Config: headless={request.config.headlessMode}, stealth={request.config.stealthMode}")
-    print(f"{'='*60}")
+def _organizer_metrics(workers: Optional[dict]) -> Optional[dict]:
+    """This process's organizer stats plus the counters pool workers reported."""
+    # Only once loaded — metrics polling shouldn't pull in google-genai
+    stats = sys.modules["ai_agent"].organizer_stats() if "ai_agent" in sys.modules else None
+    if not workers:
+        return stats
+    stats = stats or {"promptCache": {}, "hedging": None}
+    add_counters(stats["promptCache"], workers.get("promptCache"))
+    if workers.get("hedging"):
+        stats["hedging"] = add_counters(stats["hedging"] or {}, workers["hedging"])
+        stats["hedging"]["hedgeWinRate"] = hedging.win_rate(stats["hedging"])
+    return stats
+
+
+@app.get("/api/metrics")
+async def metrics():
+    workers = worker_pool.stats() if worker_pool else None
+    return {
+        "admission": admission_controller.stats(),
+        "workers": workers,
+        "organizer": _organizer_metrics(workers and workers["organizer"]),
+        "startup": startup_state.snapshot(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+async def _offload(task: str, *args):
+    """
+    Run a worker_pool.TASKS job. Browser work goes to a worker process in
+    supervisor mode; Gemini extraction is I/O-bound and always stays on the
+    default thread pool, so it keeps that pool's concurrency and never queues
+    scrapes behind 10–30 s LLM calls that admission control doesn't see.
+    """
+    if worker_pool and task in WORKER_TASKS:
+        return await asyncio.wrap_future(worker_pool.submit(task, *args))
+    module_name, func_name = TASKS[task]
+    # Imported on first use (in the executor, so a cold import never blocks the event loop)
+    return await asyncio.get_event_loop().run_in_executor(
+        None, lambda: getattr(importlib.import_module(module_name), func_name)(*args)
+    )
+
+
+def _client_id(http_request: Request) -> str:
+    """Caller identity for rate limiting (X-Forwarded-For only as far as TRUSTED_PROXY_HOPS allows)."""
+    return admission.client_id(
+        http_request.client.host if http_request.client else "",
+        http_request.headers.get("x-forwarded-for", ""),
+    )
+
+
+def _rejected_response(rejected: admission.Rejected) -> JSONResponse:
+    print(f"[API] 🚦 Rejected ({rejected.status_code}): {rejected.reason}")
+    return JSONResponse(
+        status_code=rejected.status_code,
+        content={"error": rejected.reason, "retryAfter": rejected.retry_after},
+        headers={"Retry-After": str(rejected.retry_after)},
+    )
+
+
+def _content_disposition(filename: str) -> str:
+    """Attachment header safe for any category name: ASCII fallback + RFC 5987 filename* for the original."""
+    stem, _, ext = filename.rpartition(".")
+    fallback = f'{re.sub(r"[^A-Za-z0-9._-]+", "_", stem).strip("._") or "export"}.{ext}'
+    if fallback == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _combine(html: str, api_data: str, embedded: dict) -> str:
+    """Combine HTML + API data (+ embedded structured data) for richer extraction."""
+    combined = html
+    if api_data:
+        combined = html + "\n\n===== INTERCEPTED API DATA (JSON from XHR/Fetch calls) =====\n" + api_data
+    if embedded:
+        # First, so it survives the organizer's max_chars truncation
+        combined = ("===== EMBEDDED STRUCTURED DATA (JSON-LD / microdata / OpenGraph / hydration state) =====\n"
+                    + structured_data.to_prompt_section(embedded) + "\n\n===== PAGE HTML =====\n" + combined)
+    return combined
+
+
+def _fast_path(embedded: dict, url: str, single_entity: bool):
+    """Embedded structured data as the result when it is rich enough, else None."""
+    result = structured_data.to_organized(embedded, url)
+    return result if structured_data.is_rich(result, single_entity) else None
 
-    try:
-        loop = asyncio.get_event_loop()
 
-        # ── Phase 1: Scrape the page ─────────────────────────────────────
+async def _run_pipeline(request: ScrapeRequest):
+    """Scrape + Gemini extraction. Returns an OrganizedResult or raises HTTPException."""
+    # ── Phase 1: Scrape the page ─────────────────────────────────────────
+    # Bounded: at most MAX_ACTIVE_SCRAPES browsers, MAX_QUEUED_SCRAPES waiting
+    async with admission_controller.slot():
         print("[API] Phase 1: Scraping...")
-        scrape_result = await loop.run_in_executor(
-            None,
-            scraper.get_website_content,
-            request.url,
-            request.config.headlessMode,
-            request.config.extraction_mode
+        try:
+            scrape_result = await _offload(
+                "scrape",
+                request.url,
+                request.config.headlessMode,
+                request.config.extraction_mode,
+                request.config.snapshot
+            )
+        except WorkerError as e:
+            print(f"[API] ❌ Worker failed: {e}")
+            scrape_result = (None, "", {})
+
+    # Unpack (html, api_data, embedded structured data) tuple
+    html, api_data, embedded = scrape_result if isinstance(scrape_result, tuple) else (scrape_result, "", {})
+
+    if not html:
+        raise HTTPException(status_code=500, detail="Failed to fetch website content. The page may be blocking scrapers or the URL may be invalid.")
+
+    startup_state.mark_scrape_success()
+    print(f"[API] HTML retrieved: {len(html):,} chars")
+    if api_data:
+        print(f"[API] API data captured: {len(api_data):,} chars")
+
+    # ── Fast path: JSON-LD / microdata / OpenGraph already on the page ───
+    # Mapping and prompt assembly run in the executor: the first call imports structured_data
+    loop = asyncio.get_event_loop()
+    if embedded and request.config.structuredFastPath:
+        fast_result = await loop.run_in_executor(
+            None, _fast_path, embedded, request.url, request.config.structuredSingleEntity
         )
+        if fast_result:
+            print(f"[API] ⚡ Structured data fast path: {len(fast_result.categories)} categories, "
+                  f"{fast_result.total_items} items (Gemini skipped)")
+            return fast_result
+
+    combined = await loop.run_in_executor(None, _combine, html, api_data, embedded)
 
-        # Unpack (html, api_data) tuple
-        html, api_data = scrape_result if isinstance(scrape_result, tuple) else (scrape_result, "")
+    # ── Phase 2: AI Extraction via GeminiOrganizer ───────────────────────
+    print("[API] Phase 2: Gemini AI extraction (schema-aware)...")
+    # BYOK: pass user key (never logged)
+    task = "extract_incremental" if request.config.incremental else "extract"
+    result = await _offload(task, combined, request.geminiKey, request.url)
 
-        if not html:
-            raise HTTPException(status_code=500, detail="Failed to fetch website content. The page may be blocking scrapers or the URL may be invalid.")
+    if len(result.categories) == 0 and result.total_items == 0 and not request.geminiKey:
+        raise HTTPException(status_code=400, detail="No API key provided. Please enter your Gemini API key in the settings.")
+    print(f"[API] ✅ Extracted {len(result.categories)} categories, {result.total_items} items")
+    return result
 
-        print(f"[API] HTML retrieved: {len(html):,} chars")
-        if api_data:
-            print(f"[API] API data captured: {len(api_data):,} chars")
 
-        # Combine HTML + API data for richer extraction
-        combined = html
-        if api_data:
-            combined = html + "\n\n===== INTERCEPTED API DATA (JSON from XHR/Fetch calls) =====\n" + api_data
+@app.post("/api/scrape")
+async def scrape_url(request: ScrapeRequest, http_request: Request):
+    print(f"\n{'='*60}")
+    print(f"[API] Scrape request: {request.url}")
+    print(f"[API] Config: headless={request.config.headlessMode}, stealth={request.config.stealthMode}")
+    print(f"{'='*60}")
 
-        # ── Phase 2: AI Extraction via GeminiOrganizer ───────────────────
-        print("[API] Phase 2: Gemini AI extraction (schema-aware)...")
-        # BYOK: pass user key (never logged)
-        result = await loop.run_in_executor(
-            None,
-            lambda: ai_agent.extract_structured(combined, api_key=request.geminiKey, source_url=request.url)
+    try:
+        admission_controller.check_rate(_client_id(http_request), request.geminiKey)
+        result = await _run_pipeline(request)
+
+        # Single serialization pass (orjson, default=str) + optional gzip/brotli
+        return fast_json.json_response(
+            {
+                "status": "success",
+                **result.to_api_response(),
+                "timestamp": datetime.now().isoformat(),
+                "url": request.url
+            },
+            accept_encoding=http_request.headers.get("accept-encoding", ""),
         )
 
-        api_payload = result.to_api_response()
-        
-        # Ensure payload is JSON-serializable
-        serializable_payload = json.loads(json.dumps(api_payload, default=str))
+    except admission.Rejected as rejected:
+        return _rejected_response(rejected)
+    except HTTPException as he:
+        print(f"[API] ❌ HTTPException: {he.detail}")
+        return JSONResponse(status_code=he.status_code, content={"error": he.detail})
+    except Exception as e:
+        print(f"[API] ❌ Error: {e}")
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
 
-        if serializable_payload.get('entityCount', 0) == 0 and serializable_payload.get('totalItems', 0) == 0 and not request.geminiKey:
-            raise HTTPException(status_code=400, detail="No API key provided. Please enter your Gemini API key in the settings.")
-        print(f"[API] ✅ Extracted {serializable_payload.get('entityCount')} categories, {serializable_payload.get('totalItems')} items")
+@app.post("/api/export")
+async def export_url(request: ExportRequest, http_request: Request):
+    """Scrape + extract, then stream one category (or all, for NDJSON) as CSV / NDJSON / Parquet."""
+    print(f"\n[API] Export request: {request.url} → {request.format}")
 
-        return {
-            "status": "success",
-            **serializable_payload,
-            "timestamp": datetime.now().isoformat(),
-            "url": request.url
-        }
+    if request.format not in exporter.EXPORT_FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"Unsupported format '{request.format}'. Use one of: {', '.join(exporter.EXPORT_FORMATS)}"})
 
+    try:
+        admission_controller.check_rate(_client_id(http_request), request.geminiKey)
+        result = await _run_pipeline(request)
+        chunks = exporter.stream_export(result.schema, result.data, request.format, request.category, base_url=request.url)
+    except admission.Rejected as rejected:
+        return _rejected_response(rejected)
     except HTTPException as he:
         print(f"[API] ❌ HTTPException: {he.detail}")
         return JSONResponse(status_code=he.status_code, content={"error": he.detail})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except RuntimeError as e:
+        return JSONResponse(status_code=501, content={"error": str(e)})
     except Exception as e:
         print(f"[API] ❌ Error: {e}")
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+    name = request.category or ("export" if request.format == "ndjson" else next(iter(result.data)))
+    return StreamingResponse(
+        chunks,
+        media_type=exporter.EXPORT_FORMATS[request.format],
+        headers={"Content-Disposition": _content_disposition(f"{name}.{request.format}")},
+    )
+
+
+@app.post("/api/reextract")
+async def reextract(request: ReextractRequest, http_request: Request):
+    """Rerun Gemini extraction against archived snapshots — no browser involved."""
+    print(f"\n[API] Re-extract request: {len(request.urls) or 'all'} URLs, since={request.since}")
+
+    # Validate before charging the client — a malformed request shouldn't cost a token
+    try:
+        since = datetime.fromisoformat(request.since).timestamp() if request.since else None
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": f"Invalid 'since' timestamp: {request.since}"})
+    try:
+        # The Gemini key (BYOK or server) is charged per snapshot below, not once per batch
+        admission_controller.check_client(_client_id(http_request))
+    except admission.Rejected as rejected:
+        return _rejected_response(rejected)
+
+    store = snapshots
+    loop = asyncio.get_event_loop()
+    if request.urls:
+        entries = [await loop.run_in_executor(None, lambda u=u: store.list(url=u, since=since, limit=1)) for u in request.urls]
+        entries = [e[0] for e in entries if e]
+    else:
+        entries = await loop.run_in_executor(None, lambda: store.list(since=since, limit=request.limit))
+
+    semaphore = asyncio.Semaphore(REEXTRACT_CONCURRENCY)
+
+    async def run_one(entry: dict) -> dict:
+        async with semaphore:
+            try:
+                admission_controller.check_key(request.geminiKey)
+                snap = await loop.run_in_executor(None, store.load, entry["id"])
+                combined = await loop.run_in_executor(None, _combine, snap["clean_html"], snap["api_data"], snap["embedded"])
+                result = await _offload("extract", combined, request.geminiKey, snap["url"])
+                payload = {"status": "success", **result.to_api_response()}
+            except admission.Rejected as rejected:
+                payload = {"status": "rate_limited", "error": rejected.reason, "retryAfter": rejected.retry_after}
+            except Exception as e:
+                print(f"[API] ❌ Re-extract failed for snapshot #{entry['id']}: {e}")
+                payload = {"status": "error", "error": str(e)}
+        return {
+            "url": entry["url"],
+            "snapshotId": entry["id"],
+            "capturedAt": datetime.fromtimestamp(entry["captured_at"]).isoformat(),
+            **payload,
+        }
+
+    results = await asyncio.gather(*(run_one(e) for e in entries))
+    if results and all(r["status"] == "rate_limited" for r in results):
+        return _rejected_response(admission.Rejected(results[0]["error"], results[0]["retryAfter"]))
+    print(f"[API] ✅ Re-extracted {sum(r['status'] == 'success' for r in results)}/{len(results)} snapshots")
+    return fast_json.json_response(
+        {"status": "success", "count": len(results), "results": results, "timestamp": datetime.now().isoformat()},
+        accept_encoding=http_request.headers.get("accept-encoding", ""),
+    )
+
+
+startup_state.mark_app_loaded()
+
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
+
+    parser = argparse.ArgumentParser(description="NEXUS SCRAPER API")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="Run N isolated worker processes for scraping/extraction (0 = in-process)")
+    parser.add_argument("--prewarm", action="store_true", default=PREWARM,
+                        help="Import heavy modules, build the Gemini client and launch one browser before reporting ready")
+    args = parser.parse_args()
+    WORKERS = args.workers
+    PREWARM = args.prewarm
     print("\n" + "=" * 60)
     print("[API] NEXUS SCRAPER API v3.0 — Schema-Aware Edition")
     print("=" * 60)
     print("[INFO] API URL:       http://localhost:8000")
     print("[INFO] Health Check:  http://localhost:8000/api/health")
     print("[INFO] Scrape:        POST http://localhost:8000/api/scrape")
+    print("[INFO] Export:        POST http://localhost:8000/api/export")
+    print("[INFO] Re-extract:    POST http://localhost:8000/api/reextract")
+    print("[INFO] Metrics:       http://localhost:8000/api/metrics")
+    print("[INFO] Readiness:     http://localhost:8000/api/ready")
+    print(f"[INFO] Workers:       {WORKERS or 'in-process'}")
+    print(f"[INFO] Pre-warm:      {'on' if PREWARM else 'off'}")
     print("=" * 60 + "\n")
 
     port = int(os.environ.get("PORT", 10000))
@@ -0,0 +1,85 @@
+"""
+bench_serialization.py - Per-request CPU cost of serializing a large scrape result.
+
+Compares the old path in api_server.scrape_url:
+    json.loads(json.dumps(payload, default=str))  → FastAPI jsonable_encoder → JSONResponse.render
+against the single-pass fast_json path (orjson + optional compression).
+
+Usage:
+    python bench_serialization.py [rows] [iterations]
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+
+
+def make_payload(rows: int) -> dict:
+    products = [
+        {
+            "productName": f"Wireless Headphones Model {i} — Noise Cancelling",
+            "price": 199.99 + i,
+            "currency": "USD",
+            "rating": 4.5,
+            "reviewCount": 1200 + i,
+            "inStock": i % 3 != 0,
+            "productUrl": f"https://shop.example.com/products/headphones-{i}",
+            "imageUrl": f"https://cdn.example.com/img/{i}.jpg",
+            "releaseDate": datetime(2024, 1, 1 + i % 28),
+            "description": "Over-ear Bluetooth headphones with 30h battery life. " * 2,
+        }
+        for i in range(rows)
+    ]
+    fields = {k: {"type": "string", "description": k} for k in products[0]}
+    return {
+        "status": "success",
+        "schema": {"Products": {"fields": fields}},
+        "data": {"Products": products},
+        "entityCount": 1,
+        "totalItems": rows,
+        "timestamp": datetime.now().isoformat(),
+        "url": "https://shop.example.com/headphones",
+    }
+
+
+def old_path(payload: dict) -> bytes:
+    serializable = json.loads(json.dumps(payload, default=str))
+    return JSONResponse(content=jsonable_encoder(serializable)).body
+
+
+def new_path(payload: dict) -> bytes:
+    return fast_json.json_response(payload).body
+
+
+def new_path_gzip(payload: dict) -> bytes:
+    return fast_json.json_response(payload, accept_encoding="gzip").body
+
+
+def bench(fn, payload: dict, iterations: int) -> tuple[float, int]:
+    fn(payload)  # warm-up
+    start = time.process_time()
+    for _ in range(iterations):
+        body = fn(payload)
+    return (time.process_time() - start) / iterations * 1000, len(body)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    payload = make_payload(rows)
+
+    print(f"[BENCH] {rows:,} rows, {iterations} iterations "
+          f"(orjson={'yes' if fast_json.orjson else 'no'}, brotli={'yes' if fast_json.brotli else 'no'})")
+    results = [
+        (name, *bench(fn, payload, iterations))
+        for name, fn in [("old: loads(dumps) + FastAPI", old_path), ("new: fast_json", new_path), ("new: fast_json + gzip", new_path_gzip)]
+    ]
+    baseline = results[0][1]
+    for name, ms, size in results:
+        print(f"  {name:<30} {ms:8.2f} ms CPU/request  {size / 1024:8.1f} KiB  ({baseline / ms:4.1f}x)")
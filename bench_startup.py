@@ -0,0 +1,108 @@
+"""
+bench_startup.py - Cold-start cost of the API server.
+
+Measures, each in a fresh interpreter:
+  - import time of api_server (heavy modules lazy) vs. importing scraper +
+    ai_agent + structured_data eagerly, as api_server used to
+  - with --serve: time until `/` answers (liveness) and until `/api/ready`
+    returns 200 (readiness), optionally with --prewarm
+  - with --url: time to the first successful scrape (POST /api/scrape)
+
+Usage:
+    python bench_startup.py [--runs 5] [--serve] [--prewarm] [--url https://example.com]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LAZY_IMPORT = "import api_server"
+EAGER_IMPORT = "import api_server, scraper, ai_agent, structured_data"
+
+
+def import_seconds(statement: str) -> float:
+    """Wall time of `statement` in a fresh interpreter (excludes interpreter start-up)."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _get(url: str, timeout: float = 2) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def _wait_for(url: str, start: float, deadline: float) -> float | None:
+    while time.perf_counter() - start < deadline:
+        if _get(url) == 200:
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    return None
+
+
+def serve(port: int, prewarm: bool, url: str, deadline: float) -> dict:
+    env = dict(os.environ, PORT=str(port), NEXUS_PREWARM="1" if prewarm else "0")
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "api_server.py"], cwd=HERE, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    timings = {}
+    try:
+        timings["liveness"] = _wait_for(f"{base}/", start, deadline)
+        timings["readiness"] = _wait_for(f"{base}/api/ready", start, deadline)
+        if url:
+            body = json.dumps({"url": url, "config": {"headlessMode": True, "geminiParsing": False}}).encode()
+            request = urllib.request.Request(f"{base}/api/scrape", data=body, headers={"Content-Type": "application/json"})
+            try:
+                urllib.request.urlopen(request, timeout=deadline).read()
+            except urllib.error.HTTPError:
+                pass  # No Gemini key → 400 after the scrape succeeded; the server records it either way
+            with urllib.request.urlopen(f"{base}/api/ready", timeout=5) as response:
+                timings["firstScrape"] = json.loads(response.read()).get("firstScrapeSeconds")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return timings
+
+
+def _fmt(seconds) -> str:
+    return f"{seconds:7.3f} s" if seconds is not None else "  timeout"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API server cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--serve", action="store_true", help="Also launch the server and poll / and /api/ready")
+    parser.add_argument("--prewarm", action="store_true", help="Launch with NEXUS_PREWARM=1")
+    parser.add_argument("--url", default="", help="Scrape this URL once to time the first successful scrape")
+    parser.add_argument("--port", type=int, default=10099)
+    parser.add_argument("--deadline", type=float, default=120)
+    args = parser.parse_args()
+
+    print(f"[BENCH] Import time, median of {args.runs} fresh interpreters")
+    lazy = statistics.median(import_seconds(LAZY_IMPORT) for _ in range(args.runs))
+    eager = statistics.median(import_seconds(EAGER_IMPORT) for _ in range(args.runs))
+    print(f"  {'lazy (api_server)':<30} {lazy * 1000:8.1f} ms")
+    print(f"  {'eager (+ scraper, ai_agent)':<30} {eager * 1000:8.1f} ms  ({eager / lazy:4.1f}x)")
+
+    if args.serve or args.url:
+        print(f"[BENCH] Server cold start (prewarm={'on' if args.prewarm else 'off'})")
+        timings = serve(args.port, args.prewarm, args.url, args.deadline)
+        print(f"  {'liveness  GET /':<30} {_fmt(timings['liveness'])}")
+        print(f"  {'readiness GET /api/ready':<30} {_fmt(timings['readiness'])}")
+        if args.url:
+            # Measured by the server from its own start, so it includes interpreter + import time
+            print(f"  {'first successful scrape':<30} {_fmt(timings.get('firstScrape'))}")
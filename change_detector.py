@@ -0,0 +1,276 @@
+"""
+change_detector.py - Content fingerprints for incremental re-scrapes.
+
+Monitoring workloads re-scrape the same URLs on a schedule and most of the
+time nothing has changed. This module keeps a SHA-256 digest of the cleaned
+page text per URL, plus the last OrganizedResult extracted from it, so the
+API can skip Gemini entirely when the page is unchanged and return a
+row-level diff per category when it is not.
+
+Features:
+  - Exact digest of the normalized page text (volatile tokens such as
+    timestamps and nonces stripped first), so a changed price always re-extracts
+  - Opt-in fuzzy matching via simhash over word shingles (SIMHASH_THRESHOLD > 0)
+  - SQLite-backed fingerprint store (safe across threads and processes)
+  - Row-level diff per category (added / removed / changed)
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from organized_result import OrganizedResult
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+FINGERPRINT_DB = os.getenv("FINGERPRINT_DB", "fingerprints.db")
+
+# Opt-in fuzzy matching: max Hamming distance between two simhashes that still
+# counts as "unchanged". 0 = exact digest match only. A price or stock change is
+# often 1 bit away, so anything above 0 can hide real changes.
+SIMHASH_THRESHOLD = int(os.getenv("SIMHASH_THRESHOLD", "0"))
+
+SHINGLE_SIZE = 3
+
+# Field names that usually identify a row uniquely (checked in this order)
+KEY_FIELD_HINTS = ["id", "url", "link", "href", "sku", "slug", "permalink", "title", "name"]
+
+
+# ── FINGERPRINTS ─────────────────────────────────────────────────────────────
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Tokens that change on every render without the content changing. Only
+# timestamps that carry a date are stripped — a bare "1:02:03" may be a video
+# length or race time, which is real content.
+_VOLATILE_RE = re.compile(
+    "|".join([
+        r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?",   # ISO timestamps
+        r"(?<![\d.])1[5-9]\d{11}(?![\d.])",                                                 # Epoch milliseconds (2017–2033)
+        r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b",                  # UUIDs
+        r"\b(?=[0-9a-z]*\d)(?=[0-9a-z]*[a-z])[0-9a-z]{20,}\b",                                 # Nonces / session tokens
+    ]),
+    re.IGNORECASE,
+)
+
+
+def _tokens(content: str) -> list[str]:
+    """Visible words of the cleaned HTML (+ API data), lower-cased, volatile tokens removed."""
+    return _WORD_RE.findall(_VOLATILE_RE.sub(" ", _TAG_RE.sub(" ", content)).lower())
+
+
+def content_digest(content: str) -> str:
+    """SHA-256 of the normalized token stream — equal only when the visible content is."""
+    return hashlib.sha256(" ".join(_tokens(content)).encode("utf-8")).hexdigest()
+
+
+def simhash(content: str, shingle_size: int = SHINGLE_SIZE) -> int:
+    """64-bit simhash over word shingles of the page text."""
+    words = _tokens(content)
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            if h >> bit & 1:
+                weights[bit] += 1
+            else:
+                weights[bit] -= 1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+# ── ROW DIFF ─────────────────────────────────────────────────────────────────
+
+def _row_hash(row) -> str:
+    return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _pick_key_field(old_rows: list, new_rows: list) -> str | None:
+    """Find a field whose values are present and unique in both row sets."""
+    rows = [r for r in old_rows + new_rows if isinstance(r, dict)]
+    if not rows:
+        return None
+    candidates = [f for f in rows[0].keys()]
+    ordered = sorted(
+        candidates,
+        key=lambda f: next((i for i, hint in enumerate(KEY_FIELD_HINTS) if hint in f.lower()), len(KEY_FIELD_HINTS)),
+    )
+    for field in ordered:
+        ok = True
+        for side in (old_rows, new_rows):
+            values = [r.get(field) for r in side if isinstance(r, dict)]
+            if any(v is None or isinstance(v, (dict, list)) for v in values) or len(set(map(str, values))) != len(values):
+                ok = False
+                break
+        if ok:
+            return field
+    return None
+
+
+def diff_category(old_rows: list, new_rows: list) -> dict:
+    """Row-level diff of one category: rows added, removed and changed (matched by key field)."""
+    old_rows = old_rows if isinstance(old_rows, list) else []
+    new_rows = new_rows if isinstance(new_rows, list) else []
+
+    key_field = _pick_key_field(old_rows, new_rows)
+    added, removed, changed = [], [], []
+
+    if key_field:
+        old_by_key = {str(r[key_field]): r for r in old_rows if isinstance(r, dict)}
+        new_by_key = {str(r[key_field]): r for r in new_rows if isinstance(r, dict)}
+        for key, row in new_by_key.items():
+            if key not in old_by_key:
+                added.append(row)
+            elif _row_hash(row) != _row_hash(old_by_key[key]):
+                before = old_by_key[key]
+                fields = [f for f in set(before) | set(row) if before.get(f) != row.get(f)]
+                changed.append({"key": key, "fields": sorted(fields), "before": before, "after": row})
+        removed = [row for key, row in old_by_key.items() if key not in new_by_key]
+    else:
+        # No stable key — fall back to content hashes (a changed row shows up as removed + added)
+        old_hashes = {_row_hash(r) for r in old_rows}
+        new_hashes = {_row_hash(r) for r in new_rows}
+        added = [r for r in new_rows if _row_hash(r) not in old_hashes]
+        removed = [r for r in old_rows if _row_hash(r) not in new_hashes]
+
+    return {
+        "keyField": key_field,
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchangedCount": len(new_rows) - len(added) - len(changed),
+    }
+
+
+def diff_results(old: OrganizedResult, new: OrganizedResult) -> dict:
+    """Row-level diff per category between two extractions of the same URL."""
+    diff = {}
+    for category in list(dict.fromkeys(old.categories + new.categories)):
+        entry = diff_category(old.data.get(category, []), new.data.get(category, []))
+        if entry["added"] or entry["removed"] or entry["changed"]:
+            diff[category] = entry
+    return diff
+
+
+# ── STORE ────────────────────────────────────────────────────────────────────
+
+class FingerprintStore:
+    """
+    Last fingerprint + extraction per URL, persisted in SQLite.
+
+    Usage:
+        store = FingerprintStore()
+        prior = store.get(url)          # (digest, simhash, OrganizedResult, timestamp) or None
+        store.put(url, digest, fingerprint, result)
+    """
+
+    def __init__(self, path: str = FINGERPRINT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                " url TEXT PRIMARY KEY,"
+                " fingerprint TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " digest TEXT)"
+            )
+            # Databases created before exact digests: add the column (old rows re-extract once)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(fingerprints)")}
+            if "digest" not in columns:
+                self._conn.execute("ALTER TABLE fingerprints ADD COLUMN digest TEXT")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, url: str):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT digest, fingerprint, result, updated_at FROM fingerprints WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        digest, fingerprint, payload, updated_at = row
+        stored = json.loads(payload)
+        return digest, int(fingerprint, 16), OrganizedResult(stored.get("schema", {}), stored.get("data", {})), updated_at
+
+    def put(self, url: str, digest: str, fingerprint: int, result: OrganizedResult):
+        payload = json.dumps({"schema": result.schema, "data": result.data}, default=str)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (url, fingerprint, result, updated_at, digest) VALUES (?, ?, ?, ?, ?)",
+                (url, f"{fingerprint:016x}", payload, time.time(), digest),
+            )
+            conn.commit()
+
+
+# ── INCREMENTAL EXTRACTION ───────────────────────────────────────────────────
+
+class ChangeDetector:
+    """
+    Wraps an extraction function with fingerprint-based change detection.
+    By default a page is "unchanged" only when its normalized digest matches
+    exactly; threshold > 0 additionally accepts near-duplicate simhashes.
+
+    Usage:
+        detector = ChangeDetector(store)
+        result = detector.extract(content, url, lambda: organizer.organize(content, ...))
+        # result.change_status -> "new" | "unchanged" | "changed"
+        # result.diff          -> {"Products": {"added": [...], ...}} when changed
+    """
+
+    def __init__(self, store: FingerprintStore = None, threshold: int = SIMHASH_THRESHOLD):
+        self.store = store or FingerprintStore()
+        self.threshold = threshold
+
+    def extract(self, content: str, url: str, extract_fn) -> OrganizedResult:
+        digest = content_digest(content)
+        fingerprint = simhash(content)
+        prior = self.store.get(url) if url else None
+
+        if prior:
+            prior_digest, prior_fingerprint, prior_result, updated_at = prior
+            distance = hamming_distance(fingerprint, prior_fingerprint)
+            unchanged = digest == prior_digest or (self.threshold > 0 and distance <= self.threshold)
+            if unchanged and prior_result.total_items:
+                print(f"[CHANGE] ⏭️ Unchanged (distance={distance}), skipping LLM: {url}")
+                prior_result.change_status = "unchanged"
+                prior_result.last_extracted = updated_at
+                return prior_result
+            print(f"[CHANGE] 🔄 Content changed (distance={distance}), re-extracting: {url}")
+
+        result = extract_fn()
+        if not result.total_items:
+            # Never cache a failed extraction — the next run should retry the LLM
+            return result
+
+        if url:
+            self.store.put(url, digest, fingerprint, result)
+        if prior:
+            result.change_status = "changed"
+            result.diff = diff_results(prior[2], result)
+        else:
+            result.change_status = "new"
+        return result
@@ -0,0 +1,284 @@
+"""
+exporter.py - Streaming, typed export of OrganizedResult rows.
+
+Rows are coerced to their declared schema types ("string" | "number" | "url" |
+"date" | "boolean") one column at a time, in fixed-size batches, and written out
+as CSV, NDJSON or Parquet chunks. Only one batch is ever materialized, so memory
+stays bounded for large crawl / batch outputs.
+
+Parquet needs the optional `pyarrow` package.
+"""
+
+import csv
+import io
+import json
+import re
+from datetime import date, datetime, timezone
+from urllib.parse import urljoin
+
+import fast_json
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+# ── TYPE COERCION ────────────────────────────────────────────────────────────
+
+# "1.234.567,89" (European) | "1.234.567" (dot thousands, 2+ groups) | "1,234,567.89" (thousands)
+# | "19,99" (decimal comma) | "1234.5" | ".5"
+_NUMBER_RE = re.compile(
+    r"[-+]?(?:\d{1,3}(?:\.\d{3})+,\d+(?![\d,.])|\d{1,3}(?:\.\d{3}){2,}(?![\d,.])"
+    r"|\d{1,3}(?:,\d{3})+(?!\d)(?:\.\d+)?|\d+,\d{1,2}(?![\d,])|\d+(?:\.\d+)?|\.\d+)"
+)
+# A separator right after the match means a format we don't understand ("1,2345", "1.234,5.6")
+_AMBIGUOUS_TAIL_RE = re.compile(r"[.,]\d")
+# Magnitude suffix only as a whole token: "1.2k plays", "3M views" — not "5min", "100mb"
+_SUFFIX_RE = re.compile(r"([kmb])\b")
+_SUFFIXES = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+_TRUE = {"true", "yes", "y", "1", "on", "available", "in stock"}
+_FALSE = {"false", "no", "n", "0", "off", "unavailable", "out of stock"}
+_DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y"]
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value).strip().lower()
+    match = _NUMBER_RE.search(text)
+    if not match:
+        return None
+    if _AMBIGUOUS_TAIL_RE.match(text, match.end()):
+        return None
+    raw = match.group()
+    if "," in raw and ("." in raw or re.search(r",\d{1,2}$", raw)) and raw.rfind(",") > raw.rfind("."):
+        number = float(raw.replace(".", "").replace(",", "."))   # European: "." thousands, "," decimal
+    elif raw.count(".") > 1:
+        number = float(raw.replace(".", ""))
+    else:
+        number = float(raw.replace(",", ""))
+    suffix = _SUFFIX_RE.match(text, match.end())
+    if suffix:
+        number *= _SUFFIXES[suffix.group(1)]
+    return int(number) if number.is_integer() else number
+
+
+def _to_date(value):
+    """ISO date ("2024-01-05") when the input has no time part, full ISO datetime otherwise."""
+    text = str(value).strip()
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _to_utc_datetime(iso: str) -> str:
+    """Coerced ISO date/datetime → one canonical form: UTC with offset (naive values taken as UTC)."""
+    parsed = datetime.fromisoformat(iso) if "T" in iso else datetime.combine(date.fromisoformat(iso), datetime.min.time())
+    parsed = parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return parsed.isoformat()
+
+
+def _to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    return None
+
+
+def _to_string(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def coerce_column(values: list, field_type: str, base_url: str = "") -> list:
+    """Coerce one column to its declared type. Values that don't parse become None."""
+    if field_type == "number":
+        convert = _to_number
+    elif field_type == "date":
+        convert = _to_date
+    elif field_type == "boolean":
+        convert = _to_boolean
+    elif field_type == "url":
+        convert = lambda v: urljoin(base_url, str(v).strip()) if base_url else str(v).strip()
+    else:
+        convert = _to_string
+    return [None if v is None or v == "" else convert(v) for v in values]
+
+
+def _columns(schema: dict, category: str, rows: list) -> dict:
+    """Declared field → type map; falls back to the first row's keys as strings."""
+    fields = (schema.get(category) or {}).get("fields") or {}
+    if fields:
+        return {name: (spec or {}).get("type", "string") for name, spec in fields.items()}
+    first = next((r for r in rows if isinstance(r, dict)), {})
+    return {name: "string" for name in first}
+
+
+def datetime_columns(columns: dict, rows: list) -> set:
+    """Date columns where any value carries a time of day (exported as UTC datetimes throughout)."""
+    return {
+        name for name, field_type in columns.items()
+        if field_type == "date" and any(
+            v is not None and "T" in v
+            for v in coerce_column([r.get(name) if isinstance(r, dict) else None for r in rows], "date")
+        )
+    }
+
+
+def iter_typed_batches(schema: dict, data: dict, category: str, base_url: str = "", batch_size: int = BATCH_SIZE):
+    """Yield (columns, column_values) for each batch of a category, coerced per column."""
+    rows = data.get(category) or []
+    columns = _columns(schema, category, rows)
+    # One format per column: every value of a datetime column becomes a UTC datetime
+    widen = datetime_columns(columns, rows)
+    for start in range(0, len(rows), batch_size):
+        batch = [r if isinstance(r, dict) else {} for r in rows[start:start + batch_size]]
+        values = {
+            name: coerce_column([r.get(name) for r in batch], field_type, base_url)
+            for name, field_type in columns.items()
+        }
+        for name in widen:
+            values[name] = [None if v is None else _to_utc_datetime(v) for v in values[name]]
+        yield columns, values
+
+
+# ── WRITERS ──────────────────────────────────────────────────────────────────
+
+def stream_csv(schema: dict, data: dict, category: str, base_url: str = "", batch_size: int = BATCH_SIZE):
+    """Yield CSV text chunks (header first) for one category."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    header_written = False
+    for columns, values in iter_typed_batches(schema, data, category, base_url, batch_size):
+        if not header_written:
+            writer.writerow(columns.keys())
+            header_written = True
+        writer.writerows(zip(*values.values()))
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if not header_written:
+        writer.writerow(_columns(schema, category, []).keys())
+        yield buf.getvalue()
+
+
+def stream_ndjson(schema: dict, data: dict, categories: list, base_url: str = "", batch_size: int = BATCH_SIZE):
+    """Yield NDJSON chunks; each line is one row tagged with its category."""
+    for category in categories:
+        for columns, values in iter_typed_batches(schema, data, category, base_url, batch_size):
+            names = list(columns)
+            lines = [fast_json.dumps({"category": category, **dict(zip(names, row))}) for row in zip(*values.values())]
+            yield b"\n".join(lines) + b"\n"
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only sink whose buffer can be drained while tell() keeps the absolute offset."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks = []
+        return out
+
+
+_ARROW_TYPES = {"number": "float64", "boolean": "bool_", "string": "string", "url": "string"}
+
+
+def _arrow_dates(values: list, as_timestamp: bool) -> list:
+    """Coerced ISO strings → date objects, or datetimes (already UTC-normalized by iter_typed_batches)."""
+    parse = datetime.fromisoformat if as_timestamp else date.fromisoformat
+    return [parse(v) if v is not None else None for v in values]
+
+
+def stream_parquet(schema: dict, data: dict, category: str, base_url: str = "", batch_size: int = BATCH_SIZE):
+    """Yield Parquet bytes for one category, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = data.get(category) or []
+    columns = _columns(schema, category, rows)
+    # Date columns: date32, or a UTC timestamp when any value carries a time of day
+    timestamp_columns = datetime_columns(columns, rows)
+    fields = []
+    for name, t in columns.items():
+        if t == "date":
+            fields.append((name, pa.timestamp("us", tz="UTC") if name in timestamp_columns else pa.date32()))
+        else:
+            fields.append((name, getattr(pa, _ARROW_TYPES.get(t, "string"))()))
+    arrow_schema = pa.schema(fields)
+
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), arrow_schema)
+    try:
+        for _, values in iter_typed_batches(schema, data, category, base_url, batch_size):
+            for name, t in columns.items():
+                if t == "date":
+                    values[name] = _arrow_dates(values[name], name in timestamp_columns)
+            writer.write_table(pa.Table.from_pydict(values, schema=arrow_schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(schema: dict, data: dict, fmt: str, category: str = None, base_url: str = ""):
+    """
+    Entry point. Returns an iterator of str/bytes chunks in the requested format.
+    CSV and Parquet are single-table formats, so they export one category
+    (default: the first one); NDJSON exports every category unless one is given.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    if category and category not in data:
+        raise ValueError(f"Unknown category '{category}'. Available: {', '.join(data) or 'none'}")
+
+    if fmt == "ndjson":
+        return stream_ndjson(schema, data, [category] if category else list(data), base_url)
+
+    category = category or next(iter(data), None)
+    if category is None:
+        raise ValueError("Nothing to export — the extraction returned no categories")
+    if fmt == "csv":
+        return stream_csv(schema, data, category, base_url)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package (pip install pyarrow)")
+    return stream_parquet(schema, data, category, base_url)
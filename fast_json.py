@@ -0,0 +1,73 @@
+"""
+fast_json.py - Single-pass JSON encoding for API responses.
+
+Encodes the payload once with orjson (native speed, `default=str` for anything
+non-JSON like datetimes), optionally compresses it with brotli or gzip, and
+hands the bytes to FastAPI as a raw Response — no json.loads(json.dumps())
+round-trip and no second serialization by FastAPI.
+
+orjson and brotli are optional: falls back to the stdlib json / gzip.
+"""
+
+import gzip
+import json
+import os
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+# Payloads smaller than this are sent uncompressed (not worth the CPU)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "16384"))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _default(obj):
+    return str(obj)
+
+
+def dumps(obj) -> bytes:
+    """Serialize to UTF-8 JSON bytes in one pass."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _pick_encoding(accept_encoding: str) -> str | None:
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, accept_encoding: str = "") -> tuple[bytes, str | None]:
+    """Compress large bodies with the best encoding the client accepts."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    encoding = _pick_encoding(accept_encoding)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def json_response(payload, status_code: int = 200, accept_encoding: str = "") -> Response:
+    """Encode once, compress if worthwhile, return as a raw Response."""
+    body, encoding = compress(dumps(payload), accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -7,15 +7,24 @@ Features:
   - Model fallback chain (gemini-2.0-flash → gemini-1.5-flash → gemini-2.5-flash)
   - Pre-processing to strip HTML noise and save tokens
   - Schema-first extraction for perfectly aligned tables
+  - Cached static instruction prefix (prompt_cache.py)
+  - Truncated-output salvage + continuation requests (json_salvage.py)
+  - Optional hedged requests against the next model (hedging.py)
 """
 
 import os
 import json
 import time
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from prompt_cache import PromptCache
+from json_salvage import salvage
+from hedging import HedgeController, HEDGING_ENABLED
+from organized_result import OrganizedResult  # Re-exported: existing callers import it from here
 
 load_dotenv()
 
@@ -25,10 +34,57 @@ API_KEY = os.getenv("GEMINI_API_KEY")
 # ⚡ Model fallback chain — tries each in order if quota is hit
 MODEL_CHAIN = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-1.5-flash"]
 
+# Extra requests allowed to fetch the remainder of a truncated response
+MAX_CONTINUATIONS = 2
+
+# Enforced output envelope. "schema" is ordered first so a truncated response
+# always carries the full schema and loses rows only from the end of "data".
+FIELD_TYPES = ["string", "number", "url", "date", "boolean"]
+RESPONSE_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "schema": {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "properties": {
+                    "fields": {
+                        "type": "object",
+                        "additionalProperties": {
+                            "type": "object",
+                            "properties": {
+                                "type": {"type": "string", "enum": FIELD_TYPES},
+                                "description": {"type": "string"},
+                            },
+                            "required": ["type"],
+                        },
+                    },
+                },
+                "required": ["fields"],
+            },
+        },
+        "data": {
+            "type": "object",
+            "additionalProperties": {"type": "array", "items": {"type": "object"}},
+        },
+    },
+    "required": ["schema", "data"],
+    "propertyOrdering": ["schema", "data"],
+}
+
+# Optional API endpoint override (e.g. a local stand-in server for tests)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+
+
+class HedgeCancelled(Exception):
+    """Raised inside a losing hedged attempt so it stops before spending more quota."""
+
 
 # ── PROMPT TEMPLATE ──────────────────────────────────────────────────────────
 
-ORGANIZER_PROMPT = """
+# Static instructions — identical for every page, so they are sent as a
+# (provider-cached) system instruction. Only ORGANIZER_PAGE_TEMPLATE varies.
+ORGANIZER_INSTRUCTIONS = """
 You are a Universal Web Data Extraction Engine. Your job is to capture ALL meaningful information from ANY webpage and organize it into clean, structured JSON.
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -70,28 +126,28 @@ Every item MUST have every field from the schema (null if missing).
 Clean the data: strip HTML tags, normalize currencies to numbers, parse dates to ISO format.
 For text content: extract full text, don't truncate meaningful content.
 For links: capture both the text and the href URL.
-⚠️ CRITICAL: Convert ALL relative URLs (like /platform, /docs/scaling) to FULL absolute URLs using the source domain: {source_url}
-For example: /platform → {source_url}/platform
+⚠️ CRITICAL: Convert ALL relative URLs (like /platform, /docs/scaling) to FULL absolute URLs using the SOURCE URL given with the page.
+For example, with SOURCE URL https://example.com: /platform → https://example.com/platform
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 STEP 4 — OUTPUT FORMAT
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 Return ONLY a JSON object with this exact structure:
 
-{{
-  "schema": {{
-    "<CategoryName>": {{
-      "fields": {{
-        "<fieldName>": {{ "type": "<type>", "description": "<brief description>" }}
-      }}
-    }}
-  }},
-  "data": {{
+{
+  "schema": {
+    "<CategoryName>": {
+      "fields": {
+        "<fieldName>": { "type": "<type>", "description": "<brief description>" }
+      }
+    }
+  },
+  "data": {
     "<CategoryName>": [
-      {{ "<fieldName>": <value_or_null> }}
+      { "<fieldName>": <value_or_null> }
     ]
-  }}
-}}
+  }
+}
 
 RULES:
 - DO NOT include any text outside of the JSON.
@@ -102,7 +158,10 @@ RULES:
 - Prefer more categories with fewer items over one giant category.
 - If an "INTERCEPTED API DATA" section is present below the HTML, use it as the PRIMARY data source — it contains JSON from XHR/Fetch calls that the page loaded dynamically and is often more complete than the HTML.
 - Merge data from both HTML and API data sections. Avoid duplicates.
+- If an "EMBEDDED STRUCTURED DATA" section is present (JSON-LD, microdata, OpenGraph, hydration state such as __NEXT_DATA__), treat it as the HIGHEST-PRIORITY source: it is the site's own machine-readable data. Use the HTML to fill in anything it lacks.
+"""
 
+ORGANIZER_PAGE_TEMPLATE = """
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 SOURCE URL: {source_url}
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -111,6 +170,17 @@ RAW HTML CONTENT:
 {html_content}
 """
 
+CONTINUATION_TEMPLATE = """
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+CONTINUATION
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Your previous response for this page was cut off. Already extracted (rows per category): {done}
+The last category, "{last}", was cut off after this row:
+{last_row}
+Return ONLY what is missing, in the same JSON format: the remaining rows of "{last}" (after the row above, repeating its schema) and any categories you had not reached yet.
+Do NOT repeat rows or categories that were already extracted.
+"""
+
 
 # ── MAIN CLASS ────────────────────────────────────────────────────────────────
 
@@ -125,8 +195,18 @@ class GeminiOrganizer:
         # result.schema     -> {"Products": {"fields": {...}}}
     """
 
-    def __init__(self, max_chars: int = 80_000):
+    def __init__(self, max_chars: int = 80_000, hedging: bool = HEDGING_ENABLED):
         self.max_chars = max_chars
+        self.hedging = hedging
+        self.hedge = HedgeController()
+        self.prompt_cache = PromptCache(ORGANIZER_INSTRUCTIONS)
+        self._no_json_schema: set[str] = set()
+
+    @staticmethod
+    def _client(api_key: str):
+        if GEMINI_BASE_URL:
+            return genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=GEMINI_BASE_URL))
+        return genai.Client(api_key=api_key)
 
     def _preprocess_html(self, html: str) -> str:
         """Strip noise, truncate, remove binary junk to save tokens."""
@@ -157,6 +237,187 @@ class GeminiOrganizer:
                                 item[key] = urljoin(base_url, val)
         return data
 
+    def _config(self, model_name: str, **extra):
+        """Generation config with the enforced JSON envelope (unless this model rejected it)."""
+        if model_name not in self._no_json_schema:
+            extra["response_json_schema"] = RESPONSE_JSON_SCHEMA
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            temperature=0.0,  # Maximum determinism
+            **extra
+        )
+
+    def _generate(self, client, model_name: str, key: str, page_prompt: str):
+        """One generate_content call, using the cached instruction prefix when available."""
+        cache_name = self.prompt_cache.get(client, model_name, key)
+        if cache_name:
+            try:
+                return self._call(client, model_name, page_prompt, cached_content=cache_name)
+            except Exception as e:
+                if "cache" not in str(e).lower() and "404" not in str(e):
+                    raise
+                # Handle expired or deleted server-side — drop it and go inline this time
+                print(f"[ORGANIZER] ⚠️ Cached prefix rejected by '{model_name}', sending inline: {e}")
+                self.prompt_cache.invalidate(model_name, key)
+
+        return self._call(client, model_name, page_prompt, system_instruction=ORGANIZER_INSTRUCTIONS)
+
+    def _call(self, client, model_name: str, contents: str, **extra):
+        try:
+            return client.models.generate_content(model=model_name, contents=contents, config=self._config(model_name, **extra))
+        except Exception as e:
+            err_str = str(e)
+            if model_name in self._no_json_schema or "INVALID_ARGUMENT" not in err_str or "schema" not in err_str.lower():
+                raise
+            # Older models don't accept a JSON Schema response — remember and retry without it
+            print(f"[ORGANIZER] ⚠️ '{model_name}' rejected response_json_schema, falling back to plain JSON mode")
+            self._no_json_schema.add(model_name)
+            return client.models.generate_content(model=model_name, contents=contents, config=self._config(model_name, **extra))
+
+    @staticmethod
+    def _merge(parsed: dict, more: dict):
+        """Fold a continuation response into the salvaged result (skipping repeated rows)."""
+        schema, data = parsed.setdefault("schema", {}), parsed.setdefault("data", {})
+        for category, spec in (more.get("schema") or {}).items():
+            if isinstance(spec, dict):
+                fields = schema.setdefault(category, {"fields": {}}).setdefault("fields", {})
+                for name, field in (spec.get("fields") or {}).items():
+                    fields.setdefault(name, field)
+        for category, rows in (more.get("data") or {}).items():
+            if not isinstance(rows, list):
+                continue
+            existing = data.setdefault(category, [])
+            seen = {json.dumps(r, sort_keys=True, default=str) for r in existing}
+            for row in rows:
+                marker = json.dumps(row, sort_keys=True, default=str)
+                if marker not in seen:
+                    seen.add(marker)
+                    existing.append(row)
+
+    def _continue(self, client, model_name: str, key: str, page_prompt: str, parsed: dict,
+                  cancelled: threading.Event = None) -> dict:
+        """Re-request only the part of a truncated response that is missing."""
+        for attempt in range(MAX_CONTINUATIONS):
+            if cancelled is not None and cancelled.is_set():
+                raise HedgeCancelled(model_name)
+            data = parsed.get("data") or {}
+            last = next(reversed(data), None) if data else None
+            if last is None:
+                break
+            rows = data.get(last) or []
+            prompt = page_prompt + CONTINUATION_TEMPLATE.format(
+                done=", ".join(f"{c}={len(r) if isinstance(r, list) else 0}" for c, r in data.items()),
+                last=last,
+                last_row=json.dumps(rows[-1], ensure_ascii=False, default=str) if rows else "(no complete rows yet)",
+            )
+            try:
+                response = self._generate(client, model_name, key, prompt)
+            except Exception as e:
+                print(f"[ORGANIZER] ⚠️ Continuation {attempt + 1} from '{model_name}' failed: {e}")
+                break
+            more, complete = salvage(response.text or "")
+            self._merge(parsed, more)
+            print(f"[ORGANIZER] 🧩 Continuation {attempt + 1}: +{sum(len(r) for r in (more.get('data') or {}).values() if isinstance(r, list))} rows"
+                  f"{'' if complete else ' (truncated again)'}")
+            if complete:
+                break
+        return parsed
+
+    def _attempt(self, client, model_name: str, key: str, page_prompt: str, source_url: str,
+                 cancelled: threading.Event = None) -> "OrganizedResult":
+        """One model's full extraction (generate → salvage → continuations → alignment). Raises on failure."""
+        started = time.time()
+        response = self._generate(client, model_name, key, page_prompt)
+        self.hedge.record(model_name, time.time() - started)
+        print(f"[ORGANIZER] ⚡ '{model_name}' done in {time.time() - started:.2f}s")
+
+        # Keep every complete category / row even if the output was cut off
+        parsed, complete = salvage(response.text or "")
+        if not complete:
+            if not parsed.get("data"):
+                raise json.JSONDecodeError("Unparseable model output", response.text or "", 0)
+            if cancelled is not None and cancelled.is_set():
+                raise HedgeCancelled(model_name)
+            print(f"[ORGANIZER] ⚠️ Truncated output from '{model_name}' — salvaged "
+                  f"{sum(len(r) for r in parsed['data'].values() if isinstance(r, list))} rows, requesting the rest")
+            parsed = self._continue(client, model_name, key, page_prompt, parsed, cancelled)
+
+        # Validate structure
+        schema = parsed.get("schema", {})
+        data = parsed.get("data", {})
+
+        # Enforce schema alignment: ensure every row has all fields
+        for category, items in data.items():
+            if isinstance(items, list) and category in schema:
+                fields = list(schema[category].get("fields", {}).keys())
+                for item in items:
+                    if isinstance(item, dict):
+                        for field in fields:
+                            if field not in item:
+                                item[field] = None
+
+        # Post-process: resolve any remaining relative URLs
+        data = self._resolve_relative_urls(data, source_url)
+
+        return OrganizedResult(schema=schema, data=data)
+
+    def _organize_hedged(self, client, key: str, page_prompt: str, source_url: str):
+        """
+        Primary model first; if it hasn't answered within its hedge delay (and the
+        budget allows), race the next model in MODEL_CHAIN. First valid result wins.
+        Returns (result_or_None, models_tried, last_error).
+        """
+        primary, backup = MODEL_CHAIN[0], MODEL_CHAIN[1] if len(MODEL_CHAIN) > 1 else None
+        cancelled = threading.Event()
+        # Not a context manager: shutdown(wait=False) lets us return while the loser finishes in the background
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+        self.hedge.start_primary()
+        futures = {pool.submit(self._attempt, client, primary, key, page_prompt, source_url, cancelled): primary}
+        tried, last_error = [primary], None
+
+        try:
+            delay = self.hedge.delay(primary)
+            done, _ = wait(futures, timeout=delay)
+            if not done and backup and self.hedge.try_hedge():
+                print(f"[ORGANIZER] 🏁 '{primary}' slower than {delay:.1f}s — hedging with '{backup}'")
+                futures[pool.submit(self._attempt, client, backup, key, page_prompt, source_url, cancelled)] = backup
+                tried.append(backup)
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"[ORGANIZER] ❌ Error from '{futures[future]}': {e}")
+                        last_error = e
+                        continue
+                    # Winner — stop the loser from spending more (continuations) on a discarded result
+                    cancelled.set()
+                    hedged = futures[future] != primary
+                    self.hedge.record_win(hedged)
+                    if hedged:
+                        print(f"[ORGANIZER] 🏁 Hedge '{futures[future]}' beat '{primary}'")
+                    return result, tried, None
+            return None, tried, last_error
+        finally:
+            cancelled.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def prewarm(self, api_key: str = None) -> bool:
+        """
+        Build a genai client and prime the cached instruction prefix for the
+        primary model, so the first organize() call skips that round-trip.
+        Returns False when there is no server-side key (BYOK-only deployments).
+        """
+        key = api_key or API_KEY
+        if not key:
+            return False
+        client = self._client(key)
+        self.prompt_cache.get(client, MODEL_CHAIN[0], key)
+        return True
+
     def organize(self, raw_html: str, api_key: str = None, source_url: str = "") -> "OrganizedResult":
         """
         Core method. Feed HTML in, get a fully-typed, schema-aligned result out.
@@ -169,54 +430,26 @@ class GeminiOrganizer:
             print("[ORGANIZER] ❌ No API key provided (neither user key nor GEMINI_API_KEY env var)")
             return OrganizedResult({}, {})
 
-        start = time.time()
         clean_html = self._preprocess_html(raw_html)
         print(f"[ORGANIZER] HTML: {len(raw_html):,} → {len(clean_html):,} chars")
 
-        prompt = ORGANIZER_PROMPT.format(html_content=clean_html, source_url=source_url or "unknown")
+        # Only the page varies; the static instructions go in the cached prefix
+        page_prompt = ORGANIZER_PAGE_TEMPLATE.format(html_content=clean_html, source_url=source_url or "unknown")
 
+        client = self._client(key)
+        models = list(MODEL_CHAIN)
         last_error = None
-        for model_name in MODEL_CHAIN:
+
+        if self.hedging:
+            result, tried, last_error = self._organize_hedged(client, key, page_prompt, source_url)
+            if result is not None:
+                return result
+            # Both raced models failed — continue down the chain sequentially
+            models = [m for m in models if m not in tried]
+
+        for model_name in models:
             try:
-                client = genai.Client(api_key=key)
-                response = client.models.generate_content(
-                    model=model_name,
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        response_mime_type="application/json",
-                        temperature=0.0  # Maximum determinism
-                    )
-                )
-
-                elapsed = time.time() - start
-                print(f"[ORGANIZER] ⚡ '{model_name}' done in {elapsed:.2f}s")
-
-                text = response.text.strip()
-                if text.startswith("```json"):
-                    text = text[7:]
-                if text.endswith("```"):
-                    text = text[:-3]
-
-                parsed = json.loads(text.strip())
-
-                # Validate structure
-                schema = parsed.get("schema", {})
-                data = parsed.get("data", {})
-
-                # Enforce schema alignment: ensure every row has all fields
-                for category, items in data.items():
-                    if isinstance(items, list) and category in schema:
-                        fields = list(schema[category].get("fields", {}).keys())
-                        for item in items:
-                            if isinstance(item, dict):
-                                for field in fields:
-                                    if field not in item:
-                                        item[field] = None
-
-                # Post-process: resolve any remaining relative URLs
-                data = self._resolve_relative_urls(data, source_url)
-
-                return OrganizedResult(schema=schema, data=data)
+                return self._attempt(client, model_name, key, page_prompt, source_url)
 
             except json.JSONDecodeError as e:
                 print(f"[ORGANIZER] ❌ JSON parse error from '{model_name}': {e}")
@@ -236,39 +469,3 @@ class GeminiOrganizer:
 
         print(f"[ORGANIZER] ❌ All models exhausted. Last error: {last_error}")
         return OrganizedResult({}, {})
-
-
-# ── RESULT CONTAINER ─────────────────────────────────────────────────────────
-
-class OrganizedResult:
-    """
-    Clean container for the organizer output.
-    Provides helper properties so other modules don't need to know the raw JSON shape.
-    """
-
-    def __init__(self, schema: dict, data: dict):
-        self.schema = schema
-        self.data = data
-
-    @property
-    def categories(self) -> list[str]:
-        return list(self.data.keys())
-
-    @property
-    def total_items(self) -> int:
-        return sum(len(v) for v in self.data.values() if isinstance(v, list))
-
-    def to_api_response(self) -> dict:
-        """Return the full response payload for the API."""
-        return {
-            "schema": self.schema,
-            "data": self.data,
-            "entityCount": len(self.categories),
-            "totalItems": self.total_items,
-        }
-
-    def __repr__(self):
-        return (
-            f"<OrganizedResult categories={self.categories} "
-            f"total={self.total_items}>"
-        )
@@ -0,0 +1,91 @@
+"""
+hedging.py - Latency tracking, hedge delays and hedge budget for GeminiOrganizer.
+
+Gemini latency has a long tail: one slow gemini-2.5-flash response dominates
+p99 even when another model would have answered quickly. With hedging on,
+the organizer waits for the primary model up to a percentile of its recent
+latencies, then sends the same request to the next model in MODEL_CHAIN; the
+first valid result wins.
+
+The budget caps hedges at HEDGE_BUDGET_RATIO × primary requests (never above
+1.0), so hedging can at most double quota use.
+"""
+
+import os
+import threading
+from collections import deque
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+HEDGING_ENABLED = os.getenv("GEMINI_HEDGING", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "12"))   # Until enough samples exist
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2"))
+HEDGE_BUDGET_RATIO = min(1.0, float(os.getenv("HEDGE_BUDGET_RATIO", "0.2")))
+
+LATENCY_WINDOW = 100   # Recent samples kept per model
+MIN_SAMPLES = 10       # Below this, use HEDGE_DEFAULT_DELAY
+
+
+def win_rate(stats: dict) -> float | None:
+    """Share of sent hedges that beat the primary (None before the first hedge)."""
+    sent = stats.get("hedgesSent", 0)
+    return round(stats.get("hedgeWins", 0) / sent, 3) if sent else None
+
+
+class HedgeController:
+    """
+    Per-model latency windows, the percentile-based hedge delay, the hedge
+    budget and win counters. Thread-safe; one instance per organizer.
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, budget_ratio: float = HEDGE_BUDGET_RATIO):
+        self.percentile = percentile
+        self.budget_ratio = min(1.0, budget_ratio)
+        self._latencies: dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "primaryRequests": 0,
+            "hedgesSent": 0,
+            "hedgesSkippedBudget": 0,
+            "primaryWins": 0,
+            "hedgeWins": 0,
+        }
+
+    def record(self, model_name: str, seconds: float):
+        """Latency of a completed generate call (including ones whose result was discarded)."""
+        with self._lock:
+            self._latencies.setdefault(model_name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def delay(self, model_name: str) -> float:
+        """How long to wait for `model_name` before hedging."""
+        with self._lock:
+            samples = sorted(self._latencies.get(model_name, ()))
+        if len(samples) < MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(HEDGE_MIN_DELAY, samples[index])
+
+    def start_primary(self):
+        with self._lock:
+            self.stats["primaryRequests"] += 1
+
+    def try_hedge(self) -> bool:
+        """Consume hedge budget. False when another hedge would exceed the ratio."""
+        with self._lock:
+            if self.stats["hedgesSent"] + 1 > self.budget_ratio * self.stats["primaryRequests"]:
+                self.stats["hedgesSkippedBudget"] += 1
+                return False
+            self.stats["hedgesSent"] += 1
+            return True
+
+    def record_win(self, hedged: bool):
+        with self._lock:
+            self.stats["hedgeWins" if hedged else "primaryWins"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            models = list(self._latencies)
+        stats["hedgeWinRate"] = win_rate(stats)
+        stats["delays"] = {m: round(self.delay(m), 2) for m in models}
+        return stats
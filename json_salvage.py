@@ -0,0 +1,124 @@
+"""
+json_salvage.py - Tolerant parser for truncated / slightly malformed model JSON.
+
+json.loads() throws away a whole 10–30 s generation when the model output is
+cut off by the token limit or breaks near the end. salvage() parses as far as
+it can and keeps every *complete* value:
+
+  - array elements are kept only if they finished (a half-written row is dropped)
+  - object members with a finished value are kept; a member whose value is a
+    container cut off mid-way (e.g. the last category's row list) is kept partially
+  - anything before the first "{" (stray prose, markdown fences) is ignored
+
+Returns (parsed_dict, complete) — complete is True only when the whole
+document parsed cleanly.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+
+_NUMBER_RE = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_WS = " \t\n\r"
+_LITERALS = {"true": True, "false": False, "null": None}
+
+
+def _skip_ws(s: str, i: int) -> int:
+    while i < len(s) and s[i] in _WS:
+        i += 1
+    return i
+
+
+def _parse_value(s: str, i: int):
+    """Returns (value, next_index, complete)."""
+    i = _skip_ws(s, i)
+    if i >= len(s):
+        return None, i, False
+    c = s[i]
+    if c == "{":
+        return _parse_object(s, i + 1)
+    if c == "[":
+        return _parse_array(s, i + 1)
+    if c == '"':
+        try:
+            value, end = scanstring(s, i + 1, False)
+        except ValueError:
+            return None, len(s), False
+        return value, end, True
+    for literal, value in _LITERALS.items():
+        if s.startswith(literal, i):
+            return value, i + len(literal), True
+        if len(s) - i < len(literal) and literal.startswith(s[i:]):
+            return None, len(s), False  # Truncated mid-literal
+    match = _NUMBER_RE.match(s, i)
+    if match:
+        # A number that runs into the end of the text may have lost digits
+        if match.end() >= len(s):
+            return None, len(s), False
+        text = match.group()
+        value = float(text) if any(ch in text for ch in ".eE") else int(text)
+        return value, match.end(), True
+    return None, i, False  # Malformed — stop here
+
+
+def _parse_object(s: str, i: int):
+    obj = {}
+    while True:
+        i = _skip_ws(s, i)
+        if i >= len(s):
+            return obj, i, False
+        if s[i] == "}":
+            return obj, i + 1, True
+        if s[i] == ",":
+            i += 1
+            continue
+        if s[i] != '"':
+            return obj, i, False
+        try:
+            key, i = scanstring(s, i + 1, False)
+        except ValueError:
+            return obj, len(s), False
+        i = _skip_ws(s, i)
+        if i >= len(s) or s[i] != ":":
+            return obj, i, False
+        value, i, complete = _parse_value(s, i + 1)
+        if complete:
+            obj[key] = value
+            continue
+        if isinstance(value, (dict, list)) and value:
+            obj[key] = value  # Keep the finished part of a cut-off container
+        return obj, i, False
+
+
+def _parse_array(s: str, i: int):
+    arr = []
+    while True:
+        i = _skip_ws(s, i)
+        if i >= len(s):
+            return arr, i, False
+        if s[i] == "]":
+            return arr, i + 1, True
+        if s[i] == ",":
+            i += 1
+            continue
+        value, i, complete = _parse_value(s, i)
+        if not complete:
+            return arr, i, False  # Drop the half-written element
+        arr.append(value)
+
+
+def salvage(text: str) -> tuple[dict, bool]:
+    """Parse as much of a JSON object as possible. Returns (dict, complete)."""
+    text = text or ""
+    start = text.find("{")
+    if start < 0:
+        return {}, False
+    # Fast path: well-formed output
+    try:
+        parsed, end = json.JSONDecoder().raw_decode(text, start)
+        if isinstance(parsed, dict):
+            return parsed, True
+    except json.JSONDecodeError:
+        pass
+    value, _, complete = _parse_object(text, start + 1)
+    return value, complete
@@ -0,0 +1,54 @@
+"""
+organized_result.py - Result container shared by every extraction path.
+
+Lives apart from gemini_organizer.py so the structured-data fast path,
+change detection and export can build and read results without importing
+google-genai.
+"""
+
+from datetime import datetime
+
+
+class OrganizedResult:
+    """
+    Clean container for the organizer output.
+    Provides helper properties so other modules don't need to know the raw JSON shape.
+    """
+
+    def __init__(self, schema: dict, data: dict):
+        self.schema = schema
+        self.data = data
+        # Set by change_detector on incremental re-scrapes
+        self.change_status: str | None = None   # "new" | "unchanged" | "changed"
+        self.diff: dict | None = None
+        self.last_extracted: float | None = None
+
+    @property
+    def categories(self) -> list[str]:
+        return list(self.data.keys())
+
+    @property
+    def total_items(self) -> int:
+        return sum(len(v) for v in self.data.values() if isinstance(v, list))
+
+    def to_api_response(self) -> dict:
+        """Return the full response payload for the API."""
+        payload = {
+            "schema": self.schema,
+            "data": self.data,
+            "entityCount": len(self.categories),
+            "totalItems": self.total_items,
+        }
+        if self.change_status:
+            payload["changeStatus"] = self.change_status
+        if self.diff is not None:
+            payload["diff"] = self.diff
+        if self.last_extracted:
+            payload["lastExtracted"] = datetime.fromtimestamp(self.last_extracted).isoformat()
+        return payload
+
+    def __repr__(self):
+        return (
+            f"<OrganizedResult categories={self.categories} "
+            f"total={self.total_items}>"
+        )
@@ -0,0 +1,159 @@
+"""
+prompt_cache.py - Provider-side context caching for the static organizer prompt.
+
+The ORGANIZER_INSTRUCTIONS block (~4 KB of rules) is identical for every
+extraction, so it is uploaded once per (model, API key) as a Gemini cached
+content and referenced by name; only the page itself is sent per request.
+
+Handles expire after CACHE_TTL seconds and are refreshed (TTL extended) when
+they get within CACHE_REFRESH_MARGIN of expiry. Models or keys that can't
+cache fall back to sending the instructions as a plain system instruction —
+still a stable prefix, so implicit caching can apply:
+
+  - prompt below the model's minimum cacheable size: checked once per model
+    with count_tokens (or learned from a "too small" rejection) and remembered
+    for the life of the process, so no request pays a doomed create call
+  - anything else (free tier, stand-in server without a caches endpoint, ...):
+    remembered for CACHE_RETRY_AFTER seconds, then tried again
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from google.genai import types
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+CACHE_REFRESH_MARGIN = int(os.getenv("PROMPT_CACHE_REFRESH_MARGIN", "300"))
+# How long to remember that a model/key can't cache before trying again
+CACHE_RETRY_AFTER = int(os.getenv("PROMPT_CACHE_RETRY_AFTER", "900"))
+CACHE_ENABLED = os.getenv("PROMPT_CACHE", "1") != "0"
+
+# Minimum tokens Gemini accepts for an explicit cache, per model
+CACHE_MIN_TOKENS = {"gemini-2.5-flash": 1024, "gemini-2.5-pro": 2048}
+DEFAULT_CACHE_MIN_TOKENS = 4096
+
+
+class PromptCache:
+    """
+    Cached-content handles for one static system instruction, per (model, key).
+
+    Usage:
+        cache = PromptCache(ORGANIZER_INSTRUCTIONS)
+        name = cache.get(client, model_name, api_key)   # None → send system_instruction instead
+    """
+
+    def __init__(self, instructions: str, ttl: int = CACHE_TTL, enabled: bool = CACHE_ENABLED):
+        self.instructions = instructions
+        self.ttl = ttl
+        self.enabled = enabled
+        self._handles: dict[tuple, tuple[str, float]] = {}   # (model, key hash) → (name, expires_at)
+        self._unavailable: dict[tuple, float] = {}            # (model, key hash) → retry_at
+        self._too_small: set[str] = set()                     # Models whose minimum we're below (permanent)
+        self._sized: set[str] = set()                         # Models that passed the size check
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "created": 0, "refreshed": 0, "fallbacks": 0}
+
+    @staticmethod
+    def _slot(model_name: str, api_key: str) -> tuple:
+        return model_name, hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, client, model_name: str, api_key: str) -> str | None:
+        """Return a live cached-content name for this model/key, creating or refreshing it if needed."""
+        if not self.enabled:
+            return None
+        slot = self._slot(model_name, api_key)
+        now = time.time()
+
+        with self._lock:
+            if model_name in self._too_small or self._unavailable.get(slot, 0) > now:
+                self.stats["fallbacks"] += 1
+                return None
+            handle = self._handles.get(slot)
+
+        if handle:
+            name, expires_at = handle
+            if expires_at - now > CACHE_REFRESH_MARGIN:
+                with self._lock:
+                    self.stats["hits"] += 1
+                return name
+            if expires_at > now and self._refresh(client, slot, name):
+                return name
+
+        return self._create(client, slot)
+
+    @staticmethod
+    def _is_too_small(error: Exception) -> bool:
+        text = str(error).lower()
+        return "too small" in text or "min_total_token_count" in text
+
+    def _mark_too_small(self, model_name: str, detail: str):
+        print(f"[CACHE] ℹ️ Instructions below '{model_name}' minimum cache size ({detail}) — sending inline from now on")
+        with self._lock:
+            self._too_small.add(model_name)
+            self.stats["fallbacks"] += 1
+
+    def _large_enough(self, client, model_name: str) -> bool:
+        """One count_tokens call per model; if it fails, let caches.create decide."""
+        if model_name in self._sized:
+            return True
+        minimum = CACHE_MIN_TOKENS.get(model_name, DEFAULT_CACHE_MIN_TOKENS)
+        try:
+            tokens = client.models.count_tokens(model=model_name, contents=self.instructions).total_tokens
+        except Exception:
+            return True
+        if tokens is not None and tokens < minimum:
+            self._mark_too_small(model_name, f"{tokens} < {minimum} tokens")
+            return False
+        with self._lock:
+            self._sized.add(model_name)
+        return True
+
+    def _create(self, client, slot: tuple) -> str | None:
+        model_name = slot[0]
+        if not self._large_enough(client, model_name):
+            return None
+        try:
+            cached = client.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=self.instructions,
+                    display_name="nexus-organizer-instructions",
+                    ttl=f"{self.ttl}s",
+                ),
+            )
+        except Exception as e:
+            if self._is_too_small(e):
+                self._mark_too_small(model_name, "rejected by the server")
+                return None
+            print(f"[CACHE] ⚠️ Context cache unavailable for '{model_name}', sending instructions inline: {e}")
+            with self._lock:
+                self._unavailable[slot] = time.time() + CACHE_RETRY_AFTER
+                self.stats["fallbacks"] += 1
+            return None
+
+        with self._lock:
+            self._handles[slot] = (cached.name, time.time() + self.ttl)
+            self.stats["created"] += 1
+        print(f"[CACHE] 📌 Cached organizer instructions for '{model_name}' ({cached.name})")
+        return cached.name
+
+    def _refresh(self, client, slot: tuple, name: str) -> bool:
+        try:
+            client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+        except Exception as e:
+            print(f"[CACHE] ⚠️ Refresh failed for {name}, recreating: {e}")
+            with self._lock:
+                self._handles.pop(slot, None)
+            return False
+        with self._lock:
+            self._handles[slot] = (name, time.time() + self.ttl)
+            self.stats["refreshed"] += 1
+        return True
+
+    def invalidate(self, model_name: str, api_key: str):
+        """Forget a handle the server no longer knows (expired / deleted)."""
+        with self._lock:
+            self._handles.pop(self._slot(model_name, api_key), None)
@@ -11,12 +11,26 @@ import time
 import os
 import traceback
 import json
+import structured_data
+from snapshot_store import SnapshotStore, SNAPSHOT_ALL
+
+_snapshots = None
+
+
+def _save_snapshot(url, raw_html, clean, api_data_str, embedded, extraction_mode):
+    """Archive this scrape for later re-extraction (never fails the scrape)."""
+    global _snapshots
+    try:
+        if _snapshots is None:
+            _snapshots = SnapshotStore()
+        snapshot_id = _snapshots.save(url, raw_html, clean, api_data_str, embedded, extraction_mode)
+        print(f"📦 Snapshot #{snapshot_id} saved")
+    except Exception as e:
+        print(f"⚠️ Snapshot save failed: {e}")
 
-def get_website_content(url: str, headless: bool = False, extraction_mode: str = "html") -> tuple[str | None, str]:
-    print(f"\n🕵️ Scraping (Pure DrissionPage): {url}")
-    
-    is_server = bool(os.environ.get("RENDER") or os.environ.get("CHROMIUM_PATH"))
 
+def _browser_options(headless: bool, is_server: bool) -> tuple[ChromiumOptions, str]:
+    """Chromium launch options + the throwaway profile dir they point at."""
     temp_user_data = tempfile.mkdtemp()
     
     co = ChromiumOptions()
@@ -46,6 +60,37 @@ def get_website_content(url: str, headless: bool = False, extraction_mode: str =
     chromium_path = os.environ.get("CHROMIUM_PATH")
     if chromium_path:
         co.set_browser_path(chromium_path)
+    return co, temp_user_data
+
+
+def prewarm_browser() -> float:
+    """
+    Launch and quit one headless Chromium so the first real scrape finds the
+    binary, its shared libraries and fonts in the OS page cache. Returns seconds.
+    """
+    start = time.perf_counter()
+    is_server = bool(os.environ.get("RENDER") or os.environ.get("CHROMIUM_PATH"))
+    co, temp_user_data = _browser_options(True, is_server)
+    page = None
+    try:
+        page = ChromiumPage(addr_or_opts=co)
+        page.get("about:blank")
+    finally:
+        if page:
+            try:
+                page.quit()
+            except:
+                pass
+        shutil.rmtree(temp_user_data, ignore_errors=True)
+    return time.perf_counter() - start
+
+
+def get_website_content(url: str, headless: bool = False, extraction_mode: str = "html",
+                        snapshot: bool = False) -> tuple[str | None, str, dict]:
+    print(f"\n🕵️ Scraping (Pure DrissionPage): {url}")
+    
+    is_server = bool(os.environ.get("RENDER") or os.environ.get("CHROMIUM_PATH"))
+    co, temp_user_data = _browser_options(headless, is_server)
     
     page = None
     api_responses = []
@@ -63,7 +108,7 @@ def get_website_content(url: str, headless: bool = False, extraction_mode: str =
                 print(f"⚠️ Browser attempt {attempt+1} failed: {e}")
                 if attempt == max_retries - 1:
                     print("❌ Browser connection failed completely.")
-                    return None, ""
+                    return None, "", {}
                 time.sleep(2)
                 
         page.run_js("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -139,7 +184,16 @@ def get_website_content(url: str, headless: bool = False, extraction_mode: str =
                     pass
                 
         raw_html = page.html
+
         soup = BeautifulSoup(raw_html, "html.parser")
+
+        # JSON-LD / microdata / OpenGraph / hydration state — same soup, before <script> tags are dropped
+        try:
+            embedded = structured_data.extract(raw_html, soup)
+        except Exception as e:
+            print(f"⚠️ Structured data extraction failed: {e}")
+            embedded = {}
+
         for tag in soup(["script", "style", "svg", "iframe", "noscript"]):
             tag.decompose()
         for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
@@ -150,13 +204,16 @@ def get_website_content(url: str, headless: bool = False, extraction_mode: str =
         if api_responses:
             api_data_str = json.dumps(api_responses, ensure_ascii=False)[:MAX_API_DATA_BYTES]
             
-        print(f"✅ Captured {len(clean):,} chars HTML + {len(api_data_str):,} chars API")
-        return clean[:300000], api_data_str
+        print(f"✅ Captured {len(clean):,} chars HTML + {len(api_data_str):,} chars API"
+              f" + structured data: {', '.join(embedded) or 'none'}")
+        if snapshot or SNAPSHOT_ALL:
+            _save_snapshot(url, raw_html, clean[:300000], api_data_str, embedded, extraction_mode)
+        return clean[:300000], api_data_str, embedded
         
     except Exception as e:
         print(f"❌ Scraper error: {e}")
         traceback.print_exc()
-        return None, ""
+        return None, "", {}
     finally:
         if page:
             try:
@@ -0,0 +1,156 @@
+"""
+snapshot_store.py - Content-addressed, compressed archive of scraped pages.
+
+Changing the prompt or schema rules shouldn't mean re-running the browser
+phase for every URL. When snapshots are enabled, each scrape stores its raw
+HTML, cleaned HTML, captured API payloads and embedded structured data here;
+/api/reextract then reruns extraction against the stored copies in bulk.
+The archive doubles as a replayable benchmark corpus.
+
+Layout (under SNAPSHOT_DIR):
+    objects/ab/abcdef….zst   blobs keyed by SHA-256 of their content (zstd, zlib fallback)
+    index.db                 SQLite index: url, captured_at, blob hashes
+
+Identical content is stored once, so re-scraping an unchanged page only adds
+an index row. zstd needs the optional `zstandard` package; without it blobs
+are zlib-compressed.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_ALL = os.getenv("SNAPSHOT_ALL", "0") == "1"   # Snapshot every scrape, not just opted-in ones
+ZSTD_LEVEL = 10
+
+PARTS = ("raw_html", "clean_html", "api_data", "embedded")
+
+
+class SnapshotStore:
+    """
+    Usage:
+        store = SnapshotStore()
+        snapshot_id = store.save(url, raw_html, clean_html, api_data, embedded)
+        snap = store.load(store.latest(url)["id"])   # {"clean_html": ..., "api_data": ..., ...}
+    """
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # ── blobs ────────────────────────────────────────────────────────────────
+
+    def _path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + ext)
+
+    def put_blob(self, content: bytes) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        ext = ".zst" if zstandard else ".zlib"
+        path = self._path(digest, ext)
+        if os.path.exists(self._path(digest, ".zst")) or os.path.exists(self._path(digest, ".zlib")):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if zstandard:
+            compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(content)
+        else:
+            compressed = zlib.compress(content, 6)
+        # Write-then-rename so concurrent workers never see a partial blob
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp, path)
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        path = self._path(digest, ".zst")
+        if os.path.exists(path):
+            if not zstandard:
+                raise RuntimeError("Snapshot is zstd-compressed; install the 'zstandard' package to read it")
+            with open(path, "rb") as f:
+                return zstandard.ZstdDecompressor().decompress(f.read())
+        with open(self._path(digest, ".zlib"), "rb") as f:
+            return zlib.decompress(f.read())
+
+    # ── index ────────────────────────────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.root, "index.db"), check_same_thread=False, timeout=30)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " url TEXT NOT NULL,"
+                " captured_at REAL NOT NULL,"
+                " extraction_mode TEXT,"
+                " raw_html TEXT, clean_html TEXT, api_data TEXT, embedded TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS snapshots_url_time ON snapshots (url, captured_at)")
+            self._conn.commit()
+        return self._conn
+
+    def save(self, url: str, raw_html: str, clean_html: str, api_data: str = "", embedded: dict = None,
+             extraction_mode: str = "html") -> int:
+        hashes = {
+            "raw_html": self.put_blob((raw_html or "").encode("utf-8")),
+            "clean_html": self.put_blob((clean_html or "").encode("utf-8")),
+            "api_data": self.put_blob((api_data or "").encode("utf-8")),
+            "embedded": self.put_blob(json.dumps(embedded or {}, ensure_ascii=False, default=str).encode("utf-8")),
+        }
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "INSERT INTO snapshots (url, captured_at, extraction_mode, raw_html, clean_html, api_data, embedded)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, time.time(), extraction_mode, *(hashes[p] for p in PARTS)),
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def list(self, url: str = None, since: float = None, latest_only: bool = True, limit: int = 100) -> list[dict]:
+        """Snapshot metadata, newest first. latest_only keeps one (the newest) per URL."""
+        where, params = [], []
+        if url:
+            where.append("url = ?")
+            params.append(url)
+        if since:
+            where.append("captured_at >= ?")
+            params.append(since)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        if latest_only:
+            sql = (f"SELECT * FROM snapshots WHERE id IN (SELECT MAX(id) FROM snapshots {clause} GROUP BY url)"
+                   " ORDER BY captured_at DESC LIMIT ?")
+        else:
+            sql = f"SELECT * FROM snapshots {clause} ORDER BY captured_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._connect().execute(sql, (*params, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest(self, url: str) -> dict | None:
+        rows = self.list(url=url, limit=1)
+        return rows[0] if rows else None
+
+    def load(self, snapshot_id: int) -> dict | None:
+        """Metadata + decompressed contents of one snapshot."""
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        if not row:
+            return None
+        snap = dict(row)
+        for part in PARTS:
+            text = self.get_blob(snap[part]).decode("utf-8")
+            snap[part] = json.loads(text) if part == "embedded" else text
+        return snap
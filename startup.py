@@ -0,0 +1,132 @@
+"""
+startup.py - Lazy module loading, background warm-up and readiness tracking.
+
+On scale-to-zero hosting the API must answer health checks quickly after a
+cold start. api_server.py therefore imports the heavy modules (scraper →
+DrissionPage/BeautifulSoup, ai_agent → google-genai) lazily, and an optional
+warm-up thread pays those costs up front: imports, a genai client + cached
+prompt prefix, and one throwaway Chromium launch.
+
+Liveness (`/`) is answered as soon as the app is up; readiness
+(`/api/ready`) only once warm-up has finished.
+"""
+
+import importlib
+import os
+import threading
+import time
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+PREWARM = os.getenv("NEXUS_PREWARM", "0") == "1"
+PREWARM_BROWSER = os.getenv("NEXUS_PREWARM_BROWSER", "1") == "1"
+
+# Reference point for all startup timings: when this module was first imported
+PROCESS_START = time.perf_counter()
+
+
+class LazyModule:
+    """Module proxy that imports on first attribute access (thread-safe)."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def preload(self):
+        """Import now (warm-up) instead of on first attribute access."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.preload(), attr)
+
+
+class StartupState:
+    """Warm-up progress + startup timings, served by /api/ready and /api/metrics."""
+
+    def __init__(self):
+        self.app_loaded = None          # Seconds from process start to app import done
+        self.warming = False
+        self.ready = True               # Only a running warm-up holds readiness back
+        self.phases: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.first_scrape = None        # Seconds from process start to first successful scrape
+        self._lock = threading.Lock()
+
+    def mark_app_loaded(self):
+        self.app_loaded = time.perf_counter() - PROCESS_START
+
+    def mark_scrape_success(self):
+        with self._lock:
+            if self.first_scrape is None:
+                self.first_scrape = time.perf_counter() - PROCESS_START
+                print(f"[STARTUP] ⏱️ First successful scrape {self.first_scrape:.2f}s after process start")
+
+    def warm_up(self, fn):
+        """Run fn (returns {phase: seconds}) in a background thread; mark ready when it finishes."""
+        def run():
+            start = time.perf_counter()
+            try:
+                self.phases.update(fn() or {})
+            except Exception as e:
+                self.errors["warmup"] = str(e)
+                print(f"[STARTUP] ⚠️ Warm-up failed: {e}")
+            self.phases["total"] = round(time.perf_counter() - start, 3)
+            self.warming = False
+            self.ready = True
+            print(f"[STARTUP] ✅ Ready {time.perf_counter() - PROCESS_START:.2f}s after process start "
+                  f"(warm-up {self.phases['total']:.2f}s)")
+
+        self.warming = True
+        self.ready = False
+        threading.Thread(target=run, name="warm-up", daemon=True).start()
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "warming": self.warming,
+            "appLoadedSeconds": round(self.app_loaded, 3) if self.app_loaded is not None else None,
+            "warmupPhases": dict(self.phases),
+            "warmupErrors": dict(self.errors),
+            "firstScrapeSeconds": round(self.first_scrape, 3) if self.first_scrape is not None else None,
+        }
+
+
+# ── WARM-UP ──────────────────────────────────────────────────────────────────
+
+def prewarm_worker(browser: bool = PREWARM_BROWSER, gemini: bool = True, scraper: bool = True) -> dict:
+    """
+    Warm-up for one process: import the heavy modules, build the genai client
+    + cached prompt prefix and (optionally) launch one throwaway browser.
+    Runs in-process or as the worker_pool "prewarm" task (browser side only).
+    Returns phase timings.
+    """
+    timings = {}
+    if scraper or browser:
+        start = time.perf_counter()
+        scraper_module = importlib.import_module("scraper")
+        timings["importScraper"] = round(time.perf_counter() - start, 3)
+
+    if gemini:
+        start = time.perf_counter()
+        ai_agent = importlib.import_module("ai_agent")
+        timings["importAiAgent"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        try:
+            ai_agent.prewarm()
+        except Exception as e:
+            print(f"[STARTUP] ⚠️ Gemini warm-up failed: {e}")
+        timings["genaiClient"] = round(time.perf_counter() - start, 3)
+
+    if browser:
+        start = time.perf_counter()
+        try:
+            scraper_module.prewarm_browser()
+        except Exception as e:
+            print(f"[STARTUP] ⚠️ Browser warm-up failed: {e}")
+        timings["browser"] = round(time.perf_counter() - start, 3)
+    return timings
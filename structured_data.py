@@ -0,0 +1,320 @@
+"""
+structured_data.py - Zero-LLM fast path from embedded structured data.
+
+Many e-commerce and news pages already ship their data in machine-readable
+form: JSON-LD (`application/ld+json`), microdata (`itemscope`/`itemprop`),
+OpenGraph / Twitter meta tags, and hydration blobs such as `__NEXT_DATA__`.
+scraper.py decomposes every <script> while cleaning, so these are pulled out
+of the raw HTML first.
+
+  - extract(raw_html, soup) → compact dict of the embedded blocks
+  - to_organized(blocks)    → OrganizedResult in the usual schema/data shape
+  - is_rich(result)         → True when the page can skip Gemini entirely
+  - to_prompt_section(...)  → compact JSON for the model when it can't
+"""
+
+import json
+import re
+
+from bs4 import BeautifulSoup
+
+from organized_result import OrganizedResult
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+MAX_PROMPT_CHARS = 20_000
+MAX_HYDRATION_CHARS = 12_000
+MAX_ITEMS_PER_CATEGORY = 30
+
+# A content category counts as rich (→ Gemini skipped) only with at least
+# RICH_MIN_ROWS rows, RICH_MIN_FIELDS non-null fields per row on average and
+# RICH_MIN_COVERAGE of its schema cells filled. One NewsArticle / Product row is
+# usually the page describing itself, not its content.
+RICH_MIN_ROWS = 2
+RICH_MIN_FIELDS = 4
+RICH_MIN_COVERAGE = 0.5
+
+# schema.org types that describe the site rather than the page's content
+BOILERPLATE_TYPES = {"WebSite", "WebPage", "Organization", "BreadcrumbList", "SearchAction", "SiteNavigationElement", "ImageObject"}
+
+HYDRATION_GLOBALS = ["__NEXT_DATA__", "__NUXT__", "__INITIAL_STATE__", "__PRELOADED_STATE__", "__APOLLO_STATE__", "__remixContext"]
+
+_ASSIGN_RE = re.compile(r"window\.(" + "|".join(re.escape(g) for g in HYDRATION_GLOBALS) + r")\s*=\s*")
+_NUMERIC_RE = re.compile(r"^-?\d+(\.\d+)?$")
+_NUMERIC_KEYS = ("price", "rating", "value", "count", "amount")
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ][\d:.]+(Z|[+-]\d{2}:?\d{2})?)?$")
+
+
+# ── EXTRACTION ───────────────────────────────────────────────────────────────
+
+def _jsonld(soup) -> list:
+    items = []
+    for tag in soup.find_all("script", attrs={"type": re.compile(r"ld\+json", re.I)}):
+        try:
+            parsed = json.loads(tag.string or tag.get_text() or "")
+        except (json.JSONDecodeError, TypeError):
+            continue
+        for node in parsed if isinstance(parsed, list) else [parsed]:
+            if isinstance(node, dict) and isinstance(node.get("@graph"), list):
+                items.extend(n for n in node["@graph"] if isinstance(n, dict))
+            elif isinstance(node, dict):
+                items.append(node)
+    return items
+
+
+def _microdata_value(tag):
+    if tag.has_attr("itemscope"):
+        return _microdata_item(tag)
+    for attr in ("content", "href", "src", "datetime", "value"):
+        if tag.has_attr(attr):
+            return tag[attr]
+    return " ".join(tag.get_text(" ").split())
+
+
+def _short_type(value: str) -> str:
+    """'http://schema.org/Product', 'schema:Product', '...#Product' → 'Product'."""
+    return re.split(r"[/#:]", value.strip().rstrip("/#"))[-1]
+
+
+def _microdata_item(scope) -> dict:
+    item = {}
+    itemtype = scope.get("itemtype", "").split()
+    if itemtype:
+        item["@type"] = _short_type(itemtype[0])
+    for prop in scope.find_all(attrs={"itemprop": True}):
+        # Only direct properties — skip ones that belong to a nested itemscope
+        owner = prop.find_parent(attrs={"itemscope": True})
+        if owner is not scope:
+            continue
+        for name in prop["itemprop"].split():
+            value = _microdata_value(prop)
+            if name in item:
+                item[name] = item[name] if isinstance(item[name], list) else [item[name]]
+                item[name].append(value)
+            else:
+                item[name] = value
+    return item
+
+
+def _microdata(soup) -> list:
+    return [
+        _microdata_item(scope)
+        for scope in soup.find_all(attrs={"itemscope": True})
+        if not scope.has_attr("itemprop")  # Top-level items only
+    ]
+
+
+def _opengraph(soup) -> dict:
+    meta = {}
+    for tag in soup.find_all("meta"):
+        key = tag.get("property") or tag.get("name") or ""
+        if key.startswith(("og:", "twitter:", "article:", "product:")) or key == "description":
+            if tag.get("content") and key not in meta:
+                meta[key] = tag["content"]
+    if soup.title and soup.title.string:
+        meta.setdefault("title", soup.title.string.strip())
+    return meta
+
+
+def _hydration(soup, raw_html: str) -> dict:
+    blobs = {}
+    next_data = soup.find("script", id="__NEXT_DATA__")
+    if next_data:
+        try:
+            blobs["__NEXT_DATA__"] = json.loads(next_data.string or "")
+        except (json.JSONDecodeError, TypeError):
+            pass
+    decoder = json.JSONDecoder()
+    for match in _ASSIGN_RE.finditer(raw_html):
+        name = match.group(1)
+        if name in blobs:
+            continue
+        try:
+            blobs[name], _ = decoder.raw_decode(raw_html, match.end())
+        except json.JSONDecodeError:
+            continue
+    return blobs
+
+
+def extract(raw_html: str, soup: BeautifulSoup = None) -> dict:
+    """
+    Pull every embedded structured-data block out of the raw (uncleaned) HTML.
+    Pass the caller's soup to avoid a second parse; it must not be cleaned yet.
+    """
+    if not raw_html:
+        return {}
+    if soup is None:
+        soup = BeautifulSoup(raw_html, "html.parser")
+    blocks = {
+        "jsonld": _jsonld(soup),
+        "microdata": _microdata(soup),
+        "opengraph": _opengraph(soup),
+        "hydration": _hydration(soup, raw_html),
+    }
+    return {k: v for k, v in blocks.items() if v}
+
+
+# ── MAPPING TO OrganizedResult ───────────────────────────────────────────────
+
+def _camel(name: str) -> str:
+    parts = re.split(r"[^A-Za-z0-9]+", name.lstrip("@"))
+    parts = [p for p in parts if p]
+    if not parts:
+        return "value"
+    return parts[0][:1].lower() + parts[0][1:] + "".join(p[:1].upper() + p[1:] for p in parts[1:])
+
+
+def _field_type(value) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        if value.startswith(("http://", "https://")):
+            return "url"
+        if _DATE_RE.match(value):
+            return "date"
+    return "string"
+
+
+def _scalar(value):
+    """Collapse a JSON-LD value into something that fits a table cell."""
+    if isinstance(value, dict):
+        for key in ("name", "url", "@id", "value", "ratingValue", "price", "text"):
+            if key in value and not isinstance(value[key], (dict, list)):
+                return value[key]
+        return None
+    if isinstance(value, list):
+        scalars = [_scalar(v) for v in value]
+        scalars = [str(v) for v in scalars if v is not None]
+        return ", ".join(scalars) if scalars else None
+    return value
+
+
+_FLATTEN_KEYS = ("offers", "aggregateRating", "reviewRating", "address", "geo")
+
+
+def _cell(name: str, value):
+    """Numeric-looking strings under price/rating/count-style names become numbers."""
+    if isinstance(value, str) and _NUMERIC_RE.match(value.strip()) and any(k in name.lower() for k in _NUMERIC_KEYS):
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return value
+
+
+def _flatten(node: dict) -> dict:
+    """One row per entity: scalars as-is, nested objects flattened one level (offers.price → offersPrice)."""
+    row = {}
+    for key, value in node.items():
+        if key in ("@context", "@type", "@id", "@graph", "potentialAction", "mainEntityOfPage"):
+            continue
+        if isinstance(value, list) and value and isinstance(value[0], dict) and key in _FLATTEN_KEYS:
+            value = value[0]
+        if isinstance(value, dict) and key in _FLATTEN_KEYS:
+            for sub_key, sub_value in value.items():
+                if not sub_key.startswith("@"):
+                    cell = _scalar(sub_value)
+                    if cell is not None:
+                        name = _camel(f"{key} {sub_key}")
+                        row[name] = _cell(name, cell)
+            continue
+        cell = _scalar(value)
+        if cell is not None:
+            name = _camel(key)
+            row[name] = _cell(name, cell)
+    return row
+
+
+def _type_name(node: dict) -> str:
+    node_type = node.get("@type") or "Item"
+    if isinstance(node_type, list):
+        node_type = node_type[0] if node_type else "Item"
+    return _short_type(str(node_type)) or "Item"
+
+
+def _entities(items: list) -> list:
+    """Expand ItemLists into their elements; everything else passes through."""
+    out = []
+    for node in items:
+        if _type_name(node) == "ItemList" and isinstance(node.get("itemListElement"), list):
+            for element in node["itemListElement"]:
+                if isinstance(element, dict):
+                    inner = element.get("item")
+                    out.append(inner if isinstance(inner, dict) else element)
+        else:
+            out.append(node)
+    return out
+
+
+def _category_name(type_name: str) -> str:
+    name = type_name[:1].upper() + type_name[1:]
+    return name if name.endswith("s") else name + "s"
+
+
+def to_organized(blocks: dict, source_url: str = "") -> OrganizedResult:
+    """Map JSON-LD / microdata / OpenGraph onto the schema/data shape Gemini produces."""
+    schema, data = {}, {}
+
+    og = blocks.get("opengraph") or {}
+    if og:
+        page_info = {
+            "pageTitle": og.get("og:title") or og.get("twitter:title") or og.get("title"),
+            "pageDescription": og.get("og:description") or og.get("description") or og.get("twitter:description"),
+            "pageType": og.get("og:type"),
+            "imageUrl": og.get("og:image") or og.get("twitter:image"),
+            "pageUrl": og.get("og:url") or source_url or None,
+            "siteName": og.get("og:site_name"),
+        }
+        schema["PageInfo"] = {"fields": {
+            name: {"type": "url" if name in ("imageUrl", "pageUrl") else "string", "description": "From OpenGraph / meta tags"}
+            for name in page_info
+        }}
+        data["PageInfo"] = [page_info]
+
+    for node in _entities((blocks.get("jsonld") or []) + (blocks.get("microdata") or [])):
+        row = _flatten(node)
+        if not row:
+            continue
+        category = _category_name(_type_name(node))
+        rows = data.setdefault(category, [])
+        if len(rows) >= MAX_ITEMS_PER_CATEGORY:
+            continue
+        rows.append(row)
+        fields = schema.setdefault(category, {"fields": {}})["fields"]
+        for name, value in row.items():
+            fields.setdefault(name, {"type": _field_type(value), "description": f"schema.org {_type_name(node)}.{name}"})
+
+    # Same alignment guarantee as GeminiOrganizer: every row has every field
+    for category, rows in data.items():
+        for row in rows:
+            for field in schema[category]["fields"]:
+                row.setdefault(field, None)
+
+    return OrganizedResult(schema=schema, data=data)
+
+
+def is_rich(result: OrganizedResult, single_entity: bool = False) -> bool:
+    """
+    True when at least one content category has enough well-populated rows.
+    single_entity=True (opt-in) also accepts a single row, for callers who
+    only want the page's own Product / Article metadata.
+    """
+    min_rows = 1 if single_entity else RICH_MIN_ROWS
+    for category, rows in result.data.items():
+        if category == "PageInfo" or category.rstrip("s") in BOILERPLATE_TYPES or len(rows) < min_rows:
+            continue
+        fields = len(result.schema.get(category, {}).get("fields", {})) or 1
+        filled = sum(sum(1 for v in row.values() if v not in (None, "")) for row in rows)
+        if filled / len(rows) >= RICH_MIN_FIELDS and filled / (len(rows) * fields) >= RICH_MIN_COVERAGE:
+            return True
+    return False
+
+
+def to_prompt_section(blocks: dict) -> str:
+    """Compact JSON of the embedded blocks for the model (hydration state truncated)."""
+    if not blocks:
+        return ""
+    compact = dict(blocks)
+    if "hydration" in compact:
+        hydration = json.dumps(compact.pop("hydration"), ensure_ascii=False, separators=(",", ":"), default=str)
+        compact["hydration"] = hydration[:MAX_HYDRATION_CHARS]
+    return json.dumps(compact, ensure_ascii=False, separators=(",", ":"), default=str)[:MAX_PROMPT_CHARS]
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Modules live flat at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def standin():
+    """Local Gemini REST stand-in (tests/gemini_standin.py)."""
+    from gemini_standin import GeminiStandin
+
+    server = GeminiStandin()
+    yield server
+    server.close()
@@ -0,0 +1,80 @@
+"""
+gemini_standin.py - Minimal local stand-in for the Gemini REST API.
+
+Point a genai client (or gemini_organizer via GEMINI_BASE_URL) at `url` and
+it answers the calls the organizer makes:
+
+  - POST .../cachedContents          → a cache handle, or `cache_error`
+  - PATCH .../cachedContents/<id>    → TTL refresh
+  - POST .../models/<m>:countTokens  → `token_count`
+  - POST .../models/<m>:generateContent → next item of `texts` (default RESPONSE)
+
+Every request is recorded in `requests` as (method, path, body).
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSE = {
+    "schema": {"Products": {"fields": {"name": {"type": "string"}, "link": {"type": "url"}}}},
+    "data": {"Products": [{"name": "A", "link": "/a"}]},
+}
+CACHE_NAME = "cachedContents/standin"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, obj: dict, code: int = 200):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.standin.requests.append((self.command, self.path.split("?")[0], body))
+        return body
+
+    def do_POST(self):
+        standin, body = self.server.standin, self._body()
+        if self.path.split("?")[0].endswith("cachedContents"):
+            if standin.cache_error:
+                code, status, message = standin.cache_error
+                return self._send({"error": {"code": code, "status": status, "message": message}}, code)
+            return self._send({"name": CACHE_NAME, "model": body.get("model"), "expireTime": "2099-01-01T00:00:00Z"})
+        if ":countTokens" in self.path:
+            return self._send({"totalTokens": standin.token_count})
+        text = standin.texts.pop(0) if standin.texts else json.dumps(RESPONSE)
+        finish = standin.finishes.pop(0) if standin.finishes else "STOP"
+        self._send({"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": finish}]})
+
+    def do_PATCH(self):
+        self._body()
+        self._send({"name": CACHE_NAME, "expireTime": "2099-01-01T00:00:00Z"})
+
+
+class GeminiStandin:
+    def __init__(self):
+        self.requests: list[tuple] = []
+        self.texts: list[str] = []          # generateContent answers, in order
+        self.finishes: list[str] = []       # finishReason per answer (default STOP)
+        self.token_count = 5000             # countTokens answer
+        self.cache_error = None             # (code, status, message) → caches.create fails
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.standin = self
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def calls(self, marker: str, method: str = "POST") -> list[dict]:
+        """Bodies of recorded requests whose path contains marker."""
+        return [body for m, path, body in self.requests if m == method and marker in path]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import AdmissionController, Rejected, client_id
+
+
+def test_client_id_ignores_forwarded_for_without_trusted_proxies():
+    assert client_id("10.0.0.1", "6.6.6.6", trusted_hops=0) == "10.0.0.1"
+
+
+def test_client_id_uses_hop_added_by_trusted_proxies():
+    assert client_id("10.0.0.1", "spoofed, 1.2.3.4", trusted_hops=1) == "1.2.3.4"
+    assert client_id("10.0.0.1", "spoofed, 5.5.5.5, 10.1.1.1", trusted_hops=2) == "5.5.5.5"
+
+
+def test_client_id_falls_back_when_header_is_short():
+    assert client_id("10.0.0.1", "", trusted_hops=1) == "10.0.0.1"
+    assert client_id("10.0.0.1", "1.2.3.4", trusted_hops=2) == "10.0.0.1"
+    assert client_id("", "", trusted_hops=0) == "unknown"
+
+
+def test_client_bucket_limits_burst():
+    controller = AdmissionController()
+    for _ in range(admission.CLIENT_BURST):
+        controller.check_client("1.2.3.4")
+    with pytest.raises(Rejected) as info:
+        controller.check_client("1.2.3.4")
+    assert info.value.status_code == 429 and info.value.retry_after >= 1
+
+
+def test_server_key_is_rate_limited(monkeypatch):
+    monkeypatch.setattr(admission, "SERVER_API_KEY", "server-key")
+    controller = AdmissionController()
+    for _ in range(admission.KEY_BURST):
+        controller.check_key(None)
+    with pytest.raises(Rejected):
+        controller.check_key(None)
+    controller.check_key("byok-key")  # Separate bucket
+
+
+def test_slot_rejects_when_queue_is_full():
+    async def run():
+        controller = AdmissionController(max_active=1, max_queued=1, max_wait=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(Rejected):
+            async with controller.slot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
@@ -0,0 +1,82 @@
+from api_server import _content_disposition
+
+
+def test_content_disposition_ascii_name_unchanged():
+    assert _content_disposition("Products.csv") == 'attachment; filename="Products.csv"'
+
+
+def test_content_disposition_non_ascii_and_unsafe_names():
+    header = _content_disposition("产品.csv")
+    header.encode("latin-1")  # Must be a valid header value
+    assert 'filename="export.csv"' in header and "filename*=UTF-8''%E4%BA%A7%E5%93%81.csv" in header
+
+    header = _content_disposition("Http://schema.org/Products.parquet")
+    assert 'filename="Http_schema.org_Products.parquet"' in header
+
+
+def test_extraction_stays_in_process_in_supervisor_mode(monkeypatch):
+    import asyncio
+    from concurrent.futures import Future
+
+    import api_server
+
+    submitted = []
+
+    class FakePool:
+        def submit(self, task, *args):
+            submitted.append(task)
+            future = Future()
+            future.set_result(("<html></html>", "", {}))
+            return future
+
+    monkeypatch.setattr(api_server, "worker_pool", FakePool())
+    monkeypatch.setitem(api_server.TASKS, "extract", ("json", "dumps"))  # Stand-in in-process callable
+
+    assert asyncio.run(api_server._offload("scrape", "https://example.com")) == ("<html></html>", "", {})
+    assert asyncio.run(api_server._offload("extract", {"a": 1})) == '{"a": 1}'
+    assert submitted == ["scrape"]
+
+
+class _Store:
+    def list(self, url=None, since=None, limit=50):
+        urls = [url] if url else [f"https://shop.test/{n}" for n in range(200)]
+        return [{"id": n, "url": u, "captured_at": 0} for n, u in enumerate(urls[:limit])]
+
+    def load(self, snapshot_id):
+        return {"url": "https://shop.test/", "clean_html": "<p></p>", "api_data": "", "embedded": {}}
+
+
+class _Result:
+    @staticmethod
+    def to_api_response():
+        return {"data": {}}
+
+
+def _reextract_client(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import api_server
+
+    charged = []
+
+    async def offload(task, *args):
+        return _Result()
+
+    monkeypatch.setattr(api_server, "snapshots", _Store())
+    monkeypatch.setattr(api_server, "_offload", offload)
+    monkeypatch.setattr(api_server.admission_controller, "check_client", charged.append)
+    monkeypatch.setattr(api_server.admission_controller, "check_key", lambda key: None)
+    return TestClient(api_server.app), charged
+
+
+def test_reextract_limit_does_not_truncate_explicit_urls(monkeypatch):
+    client, _ = _reextract_client(monkeypatch)
+    urls = [f"https://shop.test/{n}" for n in range(80)]
+    assert client.post("/api/reextract", json={"urls": urls}).json()["count"] == 80
+    assert client.post("/api/reextract", json={"limit": 30}).json()["count"] == 30
+
+
+def test_reextract_rejects_bad_since_without_charging(monkeypatch):
+    client, charged = _reextract_client(monkeypatch)
+    assert client.post("/api/reextract", json={"since": "yesterday"}).status_code == 400
+    assert charged == []
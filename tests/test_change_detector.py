@@ -0,0 +1,50 @@
+from change_detector import ChangeDetector, FingerprintStore, content_digest
+from gemini_organizer import OrganizedResult
+
+
+def _result(price):
+    return OrganizedResult(
+        {"Products": {"fields": {"name": {"type": "string"}, "price": {"type": "number"}}}},
+        {"Products": [{"name": "Widget", "price": price}]},
+    )
+
+
+def test_price_change_changes_digest():
+    assert content_digest("Widget $19.99 in stock") != content_digest("Widget $24.99 in stock")
+    assert content_digest("in stock") != content_digest("out of stock")
+
+
+def test_dated_timestamps_and_nonces_are_ignored():
+    a = "Updated 2024-05-01T10:00:00Z token a8f3b2c9d4e5f60718293a4b price 5"
+    b = "Updated 2024-05-02T11:30:12+02:00 token ffee2299aabb00cc11dd33ee price 5"
+    assert content_digest(a) == content_digest(b)
+
+
+def test_epoch_millis_in_api_json_are_ignored():
+    assert content_digest('{"ts":1718000000123,"price":5}') == content_digest('{"ts":1718000999999,"price":5}')
+
+
+def test_bare_durations_are_content():
+    assert content_digest("Length 1:02:03") != content_digest("Length 1:02:04")
+
+
+def test_extract_reuses_unchanged_and_diffs_changed(tmp_path):
+    detector = ChangeDetector(FingerprintStore(str(tmp_path / "fp.db")))
+    calls = []
+
+    def extract(price):
+        def run():
+            calls.append(price)
+            return _result(price)
+        return run
+
+    page = "<li>Widget $19.99</li><span>Rendered 2024-05-01T10:00:00Z</span>"
+    assert detector.extract(page, "u", extract(19.99)).change_status == "new"
+
+    rerendered = page.replace("2024-05-01T10:00:00Z", "2024-05-01T10:05:00Z")
+    assert detector.extract(rerendered, "u", extract(19.99)).change_status == "unchanged"
+
+    changed = detector.extract(page.replace("$19.99", "$24.99"), "u", extract(24.99))
+    assert changed.change_status == "changed"
+    assert changed.diff["Products"]["changed"][0]["fields"] == ["price"]
+    assert calls == [19.99, 24.99]
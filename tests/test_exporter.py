@@ -0,0 +1,74 @@
+import io
+import json
+
+import pytest
+
+from exporter import _to_date, _to_number, stream_export
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1.2k plays", 1200),
+    ("3M views", 3_000_000),
+    ("$1.5B", 1_500_000_000),
+    ("$1,234.50", 1234.5),
+    ("1,234", 1234),
+    ("19,99 €", 19.99),
+    ("1,2", 1.2),
+    ("1.234,56 €", 1234.56),
+    ("1.234.567", 1_234_567),
+    ("-3", -3),
+    ("5min", 5),
+    ("100mb", 100),
+    ("1,2345", None),
+    ("n/a", None),
+])
+def test_to_number(text, expected):
+    assert _to_number(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2024-01-05", "2024-01-05"),
+    ("Jan 05, 2024", "2024-01-05"),
+    ("05/01/2024", "2024-01-05"),
+    ("2024-01-05T10:30:00Z", "2024-01-05T10:30:00+00:00"),
+    ("not a date", None),
+])
+def test_to_date(text, expected):
+    assert _to_date(text) == expected
+
+
+SCHEMA = {"Events": {"fields": {"day": {"type": "date"}, "at": {"type": "date"}}}}
+DATA = {"Events": [
+    {"day": "2024-01-05", "at": "2024-01-05T10:00:00Z"},
+    {"day": "Jan 06, 2024", "at": "2024-01-06T10:00:00"},
+    {"day": None, "at": "2024-01-07"},
+    {"day": "2024-01-08", "at": "2024-01-08T12:00:00+02:00"},
+]}
+
+
+def test_datetime_column_has_one_format():
+    lines = b"".join(stream_export(SCHEMA, DATA, "ndjson")).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [r["day"] for r in rows] == ["2024-01-05", "2024-01-06", None, "2024-01-08"]
+    assert [r["at"] for r in rows] == [
+        "2024-01-05T10:00:00+00:00",
+        "2024-01-06T10:00:00+00:00",
+        "2024-01-07T00:00:00+00:00",
+        "2024-01-08T10:00:00+00:00",
+    ]
+
+
+def test_parquet_dates_are_typed():
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(io.BytesIO(b"".join(stream_export(SCHEMA, DATA, "parquet"))))
+    assert table.schema.field("day").type == pa.date32()
+    assert table.schema.field("at").type == pa.timestamp("us", tz="UTC")
+
+
+def test_unknown_format_and_category():
+    with pytest.raises(ValueError):
+        stream_export(SCHEMA, DATA, "xml")
+    with pytest.raises(ValueError):
+        stream_export(SCHEMA, DATA, "csv", category="Nope")
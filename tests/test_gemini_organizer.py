@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import gemini_organizer
+from gemini_organizer import GeminiOrganizer
+
+SCHEMA = {"Products": {"fields": {"name": {"type": "string"}, "price": {"type": "number"}}}}
+
+
+def test_merge_skips_repeated_rows_and_unions_schema():
+    parsed = {"schema": json.loads(json.dumps(SCHEMA)), "data": {"Products": [{"name": "A", "price": 1}]}}
+    more = {
+        "schema": {
+            "Products": {"fields": {"price": {"type": "string"}, "sku": {"type": "string"}}},
+            "Reviews": {"fields": {"text": {"type": "string"}}},
+        },
+        "data": {
+            "Products": [{"price": 1, "name": "A"}, {"name": "B", "price": 2}, {"name": "B", "price": 2}],
+            "Reviews": [{"text": "ok"}],
+            "Broken": "not a list",
+        },
+    }
+    GeminiOrganizer._merge(parsed, more)
+    assert parsed["data"]["Products"] == [{"name": "A", "price": 1}, {"name": "B", "price": 2}]
+    assert parsed["data"]["Reviews"] == [{"text": "ok"}]
+    assert "Broken" not in parsed["data"]
+    fields = parsed["schema"]["Products"]["fields"]
+    assert fields["price"] == {"type": "number"}  # First definition wins
+    assert "sku" in fields and "Reviews" in parsed["schema"]
+
+
+@pytest.fixture
+def organizer(standin, monkeypatch):
+    monkeypatch.setattr(gemini_organizer, "GEMINI_BASE_URL", standin.url)
+    organizer = GeminiOrganizer(hedging=False)
+    organizer.prompt_cache.enabled = False
+    return organizer
+
+
+def test_truncated_output_is_continued_without_duplicates(standin, organizer):
+    first = json.dumps({"schema": SCHEMA, "data": {"Products": [{"name": "A", "price": 1}, {"name": "B", "price": 2}]}})
+    standin.texts = [
+        first[:first.index('{"name": "B"') + 12],  # Cut inside row B
+        json.dumps({"schema": SCHEMA, "data": {"Products": [{"name": "A", "price": 1}, {"name": "B", "price": 2}]}}),
+    ]
+    standin.finishes = ["MAX_TOKENS", "STOP"]
+
+    result = organizer.organize("<div>A B</div>", api_key="k")
+    assert result.data["Products"] == [{"name": "A", "price": 1}, {"name": "B", "price": 2}]
+
+    prompts = [body["contents"][0]["parts"][0]["text"] for body in standin.calls(":generateContent")]
+    assert len(prompts) == 2
+    assert "CONTINUATION" in prompts[1] and '{"name": "A", "price": 1}' in prompts[1]
+
+
+def test_continuations_are_bounded(standin, organizer):
+    cut = '{"schema": {}, "data": {"Products": [{"name": "A", "price": 1}, {"name": "B'
+    standin.texts = [cut] * (gemini_organizer.MAX_CONTINUATIONS + 2)
+
+    result = organizer.organize("<div>A</div>", api_key="k")
+    assert result.data["Products"] == [{"name": "A", "price": 1}]
+    assert len(standin.calls(":generateContent")) == 1 + gemini_organizer.MAX_CONTINUATIONS
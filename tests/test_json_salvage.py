@@ -0,0 +1,62 @@
+import json
+
+from json_salvage import salvage
+
+DOC = {
+    "schema": {"Products": {"fields": {"name": {"type": "string"}, "price": {"type": "number"}}}},
+    "data": {"Products": [{"name": "A", "price": 1.5}, {"name": "B \"quoted\"", "price": 20}]},
+}
+
+
+def test_well_formed_with_prose_and_fences():
+    text = "Here you go:\n```json\n" + json.dumps(DOC) + "\n```"
+    assert salvage(text) == (DOC, True)
+
+
+def test_no_object_at_all():
+    assert salvage("") == ({}, False)
+    assert salvage("Sorry, I can't help with that.") == ({}, False)
+
+
+def test_every_truncation_point_keeps_only_complete_rows():
+    text = json.dumps(DOC)
+    for cut in range(1, len(text)):
+        parsed, complete = salvage(text[:cut])
+        assert not complete
+        for row in parsed.get("data", {}).get("Products", []):
+            assert row in DOC["data"]["Products"]
+
+
+def test_trailing_half_row_is_dropped():
+    text = json.dumps(DOC)
+    cut = text.index('"B')  # Second row started but unfinished
+    parsed, complete = salvage(text[:cut + 3])
+    assert not complete
+    assert parsed["schema"] == DOC["schema"]
+    assert parsed["data"]["Products"] == [{"name": "A", "price": 1.5}]
+
+
+def test_truncated_inside_string():
+    parsed, complete = salvage('{"data": {"Products": [{"name": "A"}, {"name": "Lo\\"ng na')
+    assert parsed == {"data": {"Products": [{"name": "A"}]}} and not complete
+
+
+def test_truncated_number_is_not_trusted():
+    # "12" might have been "1299" — drop it rather than keep a wrong value
+    assert salvage('{"data": {"P": [{"n": 1}, {"n": 12') == ({"data": {"P": [{"n": 1}]}}, False)
+    assert salvage('{"a": 1, "b": -3.5e2, "c": 4') == ({"a": 1, "b": -350.0}, False)
+
+
+def test_truncated_literals():
+    assert salvage('{"a": true, "b": fal') == ({"a": True}, False)
+    assert salvage('{"a": null, "b": n') == ({"a": None}, False)
+    assert salvage('{"a": false') == ({"a": False}, False)
+
+
+def test_schema_cut_off_before_data():
+    text = '{"schema": {"Products": {"fields": {"name": {"type": "string"}, "price": {"ty'
+    assert salvage(text) == ({"schema": {"Products": {"fields": {"name": {"type": "string"}}}}}, False)
+
+
+def test_empty_cut_off_containers_are_dropped():
+    assert salvage('{"schema": {}, "data": {"Products": [') == ({"schema": {}}, False)
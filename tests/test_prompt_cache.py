@@ -0,0 +1,74 @@
+from google import genai
+from google.genai import types
+
+import prompt_cache
+from gemini_standin import CACHE_NAME
+from prompt_cache import PromptCache
+
+MODEL = "gemini-2.5-flash"
+
+
+def _client(standin):
+    return genai.Client(api_key="test-key", http_options=types.HttpOptions(base_url=standin.url))
+
+
+def test_creates_once_then_hits(standin):
+    cache, client = PromptCache("instructions", enabled=True), _client(standin)
+    assert cache.get(client, MODEL, "k") == CACHE_NAME
+    assert cache.get(client, MODEL, "k") == CACHE_NAME
+    assert len(standin.calls("cachedContents")) == 1
+    assert len(standin.calls(":countTokens")) == 1
+    assert cache.stats["created"] == 1 and cache.stats["hits"] == 1
+
+
+def test_refreshes_near_expiry(standin):
+    cache = PromptCache("instructions", ttl=prompt_cache.CACHE_REFRESH_MARGIN, enabled=True)
+    client = _client(standin)
+    cache.get(client, MODEL, "k")
+    assert cache.get(client, MODEL, "k") == CACHE_NAME
+    assert len(standin.calls(CACHE_NAME, method="PATCH")) == 1
+    assert cache.stats["refreshed"] == 1
+
+
+def test_below_model_minimum_skips_create_for_good(standin):
+    standin.token_count = 900
+    cache, client = PromptCache("instructions", enabled=True), _client(standin)
+    assert cache.get(client, MODEL, "k") is None
+    assert cache.get(client, MODEL, "other-key") is None
+    assert standin.calls("cachedContents") == []
+    assert len(standin.calls(":countTokens")) == 1
+
+
+def test_too_small_rejection_is_permanent(standin, monkeypatch):
+    monkeypatch.setattr(prompt_cache, "CACHE_RETRY_AFTER", 0)
+    standin.token_count = 100_000  # Count says fine; the server disagrees
+    standin.cache_error = (400, "INVALID_ARGUMENT",
+                           "Cached content is too small. total_token_count=1000, min_total_token_count=1024")
+    cache, client = PromptCache("instructions", enabled=True), _client(standin)
+    for _ in range(3):
+        assert cache.get(client, MODEL, "k") is None
+    assert len(standin.calls("cachedContents")) == 1
+
+
+def test_other_failures_are_retried_later(standin, monkeypatch):
+    monkeypatch.setattr(prompt_cache, "CACHE_RETRY_AFTER", 0)
+    standin.cache_error = (403, "PERMISSION_DENIED", "Caching not available on the free tier")
+    cache, client = PromptCache("instructions", enabled=True), _client(standin)
+    cache.get(client, MODEL, "k")
+    cache.get(client, MODEL, "k")
+    assert len(standin.calls("cachedContents")) == 2
+
+
+def test_organizer_sends_cached_prefix(standin, monkeypatch):
+    import gemini_organizer
+
+    monkeypatch.setattr(gemini_organizer, "GEMINI_BASE_URL", standin.url)
+    organizer = gemini_organizer.GeminiOrganizer(hedging=False)
+    organizer.prompt_cache.enabled = True
+
+    result = organizer.organize("<ul><li><a href='/a'>A</a></li></ul>", api_key="k", source_url="https://shop.test/")
+    assert result.data["Products"] == [{"name": "A", "link": "https://shop.test/a"}]
+
+    generate = standin.calls(":generateContent")
+    assert generate[0]["cachedContent"] == CACHE_NAME
+    assert "systemInstruction" not in generate[0]
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+import structured_data
+
+
+def _page(*nodes) -> str:
+    scripts = "".join(f'<script type="application/ld+json">{json.dumps(n)}</script>' for n in nodes)
+    return f"<html><head>{scripts}</head><body></body></html>"
+
+
+def _product(n: int, type_name: str) -> dict:
+    return {"@type": type_name, "name": f"P{n}", "sku": f"S{n}", "price": "9.99", "brand": "B", "url": f"/p/{n}"}
+
+
+def test_iri_and_prefixed_types_are_shortened():
+    html = _page(_product(1, "http://schema.org/Product"), _product(2, "schema:Product"), _product(3, "https://schema.org/Product/"))
+    result = structured_data.to_organized(structured_data.extract(html))
+    assert list(result.data) == ["Products"] and len(result.data["Products"]) == 3
+    assert structured_data.is_rich(result)
+
+
+def test_iri_boilerplate_types_are_not_rich():
+    html = _page(*({"@type": "http://schema.org/WebSite", "name": f"Site {n}", "url": "/", "inLanguage": "en",
+                    "description": "d"} for n in range(3)))
+    result = structured_data.to_organized(structured_data.extract(html))
+    assert "WebSites" in result.data
+    assert not structured_data.is_rich(result)
+
+
+def test_microdata_itemtype_uses_first_type():
+    html = ('<div itemscope itemtype="https://schema.org/Product https://schema.org/Thing">'
+            '<span itemprop="name">Lamp</span></div>')
+    assert structured_data.extract(html)["microdata"][0]["@type"] == "Product"
+
+
+def test_single_product_needs_opt_in():
+    result = structured_data.to_organized(structured_data.extract(_page(_product(1, "Product"))))
+    assert not structured_data.is_rich(result)
+    assert structured_data.is_rich(result, single_entity=True)
+
+
+def test_fast_path_does_not_import_genai():
+    code = ("import sys, structured_data; structured_data.to_organized({'jsonld': [{'@type': 'Product', 'name': 'A'}]}); "
+            "print('google.genai' in sys.modules or 'gemini_organizer' in sys.modules)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
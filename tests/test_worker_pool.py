@@ -0,0 +1,62 @@
+from concurrent.futures import Future
+
+import api_server
+from worker_pool import WorkerPool, _Job, _Worker, add_counters
+
+
+class _Process:
+    pid, exitcode = 0, None
+
+    @staticmethod
+    def is_alive():
+        return True
+
+
+def _done(worker, job_id, counters, retire=False):
+    return ("done", worker.slot, worker.generation, job_id, True, "ok", 10.0, retire, counters)
+
+
+def _counters(hits, hedges, wins):
+    return {"promptCache": {"hits": hits, "created": 1}, "hedging": {"hedgesSent": hedges, "hedgeWins": wins}}
+
+
+def test_add_counters_sums_integer_leaves_only():
+    total = {"a": 1, "nested": {"b": 2}, "rate": 0.5}
+    add_counters(total, {"a": 2, "nested": {"b": 3, "c": 1}, "rate": 0.25, "flag": True, "new": 4})
+    assert total == {"a": 3, "nested": {"b": 5, "c": 1}, "rate": 0.5, "new": 4}
+
+
+def test_stats_sum_live_and_retired_workers():
+    pool = WorkerPool(size=2)
+    workers = [_Worker(slot, slot + 1, _Process(), None, None) for slot in range(2)]
+    pool._workers = {w.slot: w for w in workers}
+
+    retired = []
+    for worker, job_id, counters in ((workers[0], 1, _counters(3, 2, 1)), (workers[1], 2, _counters(1, 0, 0))):
+        worker.job = _Job(job_id, "extract", (), Future(), 10)
+        pool._handle(worker, _done(worker, job_id, counters), retired)
+    # Later report from the same process replaces (cumulative), then it is recycled
+    workers[0].job = _Job(3, "extract", (), Future(), 10)
+    pool._handle(workers[0], _done(workers[0], 3, _counters(5, 4, 3), retire=True), retired)
+
+    organizer = pool.stats()["organizer"]
+    assert organizer == {"promptCache": {"hits": 6, "created": 2}, "hedging": {"hedgesSent": 4, "hedgeWins": 3}}
+    assert len(retired) == 1
+
+
+def test_scrape_only_workers_report_nothing():
+    pool = WorkerPool(size=1)
+    worker = _Worker(0, 1, _Process(), None, None)
+    pool._workers = {0: worker}
+    worker.job = _Job(1, "scrape", (), Future(), 10)
+    pool._handle(worker, _done(worker, 1, None), [])
+    assert pool.stats()["organizer"] is None
+
+
+def test_metrics_merge_worker_counters(monkeypatch):
+    monkeypatch.delitem(api_server.sys.modules, "ai_agent", raising=False)
+    assert api_server._organizer_metrics(None) is None
+
+    merged = api_server._organizer_metrics(_counters(2, 4, 1))
+    assert merged["promptCache"] == {"hits": 2, "created": 1}
+    assert merged["hedging"]["hedgeWinRate"] == 0.25
@@ -0,0 +1,430 @@
+"""
+worker_pool.py - Supervised pool of isolated worker processes.
+
+A single uvicorn process runs browser control, BeautifulSoup cleaning and JSON
+handling under one GIL, and one Chromium crash can take everything down. In
+supervisor mode the API front hands browser jobs to N worker processes. Jobs
+go out over a per-worker queue and results come back over a per-worker pipe,
+so killing one worker mid-write can never wedge result delivery for the
+others. Each worker launches its own browsers in its own process group, so a
+hang or crash is contained and killed cleanly.
+
+Workers are recycled when they:
+  - finish MAX_JOBS_PER_WORKER jobs (bounds slow leaks in Chromium / lxml)
+  - exceed WORKER_MAX_RSS_MB (worker + its browser children)
+  - run a job past its deadline (the whole process group is killed)
+  - die unexpectedly
+
+Workers that ran an extraction send their organizer counters (prompt cache,
+hedging) with every result; stats() sums them over live and retired workers.
+
+Usage:
+    pool = WorkerPool(size=4)
+    pool.start()
+    html, api_data = await asyncio.wrap_future(pool.submit("scrape", url, True, "html"))
+    pool.stop()
+"""
+
+import importlib
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+
+# ── CONFIG ───────────────────────────────────────────────────────────────────
+MAX_JOBS_PER_WORKER = int(os.getenv("MAX_JOBS_PER_WORKER", "25"))
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "1024"))
+JOB_TIMEOUT = float(os.getenv("WORKER_JOB_TIMEOUT", "180"))
+
+# Job name → (module, function). Resolved inside the worker so only names cross the pipe.
+TASKS = {
+    "scrape": ("scraper", "get_website_content"),
+    "extract": ("ai_agent", "extract_structured"),
+    "extract_incremental": ("ai_agent", "extract_incremental"),
+    "prewarm": ("startup", "prewarm_worker"),
+}
+
+
+class WorkerError(Exception):
+    """A job failed inside a worker, or the worker died / hung while running it."""
+
+
+# ── MEMORY ───────────────────────────────────────────────────────────────────
+
+def _proc_stat(pid: str) -> tuple[int, int, int] | None:
+    """(ppid, pgrp, rss pages) from /proc/<pid>/stat."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # comm (field 2) may contain spaces — split after its closing paren
+            fields = f.read().rsplit(")", 1)[1].split()
+        return int(fields[1]), int(fields[2]), int(fields[21])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _rss_mb(pid: int) -> float:
+    """Resident memory of a process and its children (browsers), in MB."""
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        procs = [proc] + proc.children(recursive=True)
+        total = 0
+        for p in procs:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / 1_048_576
+    except ImportError:
+        pass
+    except Exception:
+        return 0.0
+    # Linux fallback without psutil: the worker's process group (it calls setpgrp)
+    # plus any descendant that left it — Chromium's renderers and GPU process included
+    try:
+        stats = {int(p): _proc_stat(p) for p in os.listdir("/proc") if p.isdigit()}
+    except OSError:
+        return 0.0
+    stats = {p: s for p, s in stats.items() if s}
+    members = {p for p, (_, pgrp, _) in stats.items() if pgrp == pid or p == pid}
+    grew = True
+    while grew:
+        children = {p for p, (ppid, _, _) in stats.items() if ppid in members} - members
+        members |= children
+        grew = bool(children)
+    return sum(stats[p][2] for p in members) * os.sysconf("SC_PAGE_SIZE") / 1_048_576
+
+
+def add_counters(total: dict, more: dict) -> dict:
+    """Sum the integer leaves of `more` into `total` (nested dicts merged, ratios/floats left alone)."""
+    for key, value in (more or {}).items():
+        if isinstance(value, dict):
+            add_counters(total.setdefault(key, {}), value)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+# ── WORKER PROCESS ───────────────────────────────────────────────────────────
+
+def _organizer_counters() -> dict | None:
+    """Cumulative organizer counters of this process, once it has run an extraction."""
+    ai_agent = sys.modules.get("ai_agent")
+    return ai_agent.organizer_counters() if ai_agent else None
+
+
+def _worker_main(slot: int, generation: int, inbox, results, max_jobs: int, max_rss_mb: int):
+    """Worker loop: run jobs from inbox until told to stop or due for recycling."""
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # Own process group → supervisor can kill us + our browsers together
+
+    functions = {}
+    jobs_done = 0
+    results.send(("ready", slot, generation))
+
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        job_id, task, args = item
+        try:
+            if task not in functions:
+                module_name, func_name = TASKS[task]
+                functions[task] = getattr(importlib.import_module(module_name), func_name)
+            value, ok = functions[task](*args), True
+        except Exception as e:
+            value, ok = f"{type(e).__name__}: {e}", False
+
+        jobs_done += 1
+        rss = _rss_mb(os.getpid())
+        retire = jobs_done >= max_jobs or (max_rss_mb and rss > max_rss_mb)
+        results.send(("done", slot, generation, job_id, ok, value, rss, retire, _organizer_counters()))
+        if retire:
+            break
+
+
+# ── SUPERVISOR ───────────────────────────────────────────────────────────────
+
+class _Job:
+    __slots__ = ("id", "task", "args", "future", "timeout", "started")
+
+    def __init__(self, job_id, task, args, future, timeout):
+        self.id = job_id
+        self.task = task
+        self.args = args
+        self.future = future
+        self.timeout = timeout
+        self.started = None
+
+
+class _Worker:
+    __slots__ = ("slot", "generation", "process", "inbox", "results", "job", "ready", "jobs_done", "rss_mb", "organizer")
+
+    def __init__(self, slot, generation, process, inbox, results):
+        self.slot = slot
+        self.generation = generation
+        self.process = process
+        self.inbox = inbox
+        self.results = results  # Read end of this worker's own result pipe
+        self.job = None
+        self.ready = False
+        self.jobs_done = 0
+        self.rss_mb = 0.0
+        self.organizer = None  # Latest cumulative organizer counters reported by this process
+
+
+class WorkerPool:
+    """
+    Dispatches jobs to N isolated worker processes and keeps them healthy.
+    submit() is thread-safe and returns a concurrent.futures.Future.
+
+    self._lock only guards bookkeeping. Killing, joining, spawning and RSS
+    sampling run on the supervisor thread outside it, so submit() / stats()
+    on the event loop never wait behind a recycle.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_jobs: int = MAX_JOBS_PER_WORKER,
+        max_rss_mb: int = WORKER_MAX_RSS_MB,
+        job_timeout: float = JOB_TIMEOUT,
+    ):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.job_timeout = job_timeout
+
+        self._ctx = mp.get_context("spawn")  # No forking of the event loop / threads
+        self._workers: dict[int, _Worker] = {}
+        self._pending: deque[_Job] = deque()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._generations = itertools.count(1)
+        self._monitor = None
+        self._running = False
+        self.counters = {"completed": 0, "failed": 0, "restarts": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+        self._retired_organizer: dict = {}  # Organizer counters of workers already replaced
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self):
+        self._running = True
+        for slot in range(self.size):
+            worker = self._start_worker(slot)
+            with self._lock:
+                self._workers[slot] = worker
+        self._monitor = threading.Thread(target=self._monitor_loop, name="worker-supervisor", daemon=True)
+        self._monitor.start()
+        print(f"[POOL] 🚀 Started {self.size} worker processes")
+
+    def stop(self):
+        self._running = False
+        if self._monitor:
+            self._monitor.join(timeout=10)  # Supervisor exits within one poll interval
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            pending, self._pending = list(self._pending), deque()
+        for job in pending + [w.job for w in workers if w.job]:
+            if not job.future.done():
+                job.future.set_exception(WorkerError("Worker pool shut down"))
+        for worker in workers:
+            try:
+                worker.inbox.put(None)
+            except Exception:
+                pass
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                self._kill(worker)
+            worker.results.close()
+        print("[POOL] 🛑 Worker pool stopped")
+
+    # ── public API ───────────────────────────────────────────────────────────
+
+    def submit(self, task: str, *args, timeout: float = None) -> Future:
+        if task not in TASKS:
+            raise ValueError(f"Unknown task '{task}'")
+        future = Future()
+        with self._lock:
+            self._pending.append(_Job(next(self._ids), task, args, future, timeout or self.job_timeout))
+            self._dispatch()
+        return future
+
+    def stats(self) -> dict:
+        with self._lock:
+            organizer = add_counters({}, self._retired_organizer)
+            for worker in self._workers.values():
+                add_counters(organizer, worker.organizer)
+            return {
+                "workers": self.size,
+                "busy": sum(1 for w in self._workers.values() if w.job),
+                "pending": len(self._pending),
+                "rssMb": {w.slot: round(w.rss_mb, 1) for w in self._workers.values()},
+                **self.counters,
+                "organizer": organizer or None,
+            }
+
+    # ── process control (never with self._lock held) ─────────────────────────
+
+    def _start_worker(self, slot: int) -> _Worker:
+        generation = next(self._generations)
+        inbox = self._ctx.Queue()
+        results, results_writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(slot, generation, inbox, results_writer, self.max_jobs, self.max_rss_mb),
+            name=f"nexus-worker-{slot}",
+            daemon=True,
+        )
+        process.start()
+        results_writer.close()  # Child holds the only write end → EOF when it dies
+        return _Worker(slot, generation, process, inbox, results)
+
+    @staticmethod
+    def _kill(worker: _Worker):
+        """Kill the worker's whole process group (its browsers included)."""
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(worker.process.pid, signal.SIGKILL)
+            else:
+                worker.process.kill()
+        except (ProcessLookupError, PermissionError, OSError):
+            pass
+        worker.process.join(timeout=5)
+
+    def _restart(self, retired: list):
+        """Reap retired workers and start replacements in their slots."""
+        for worker, graceful in retired:
+            if graceful:
+                worker.process.join(timeout=5)  # Recycled: exits on its own after its last result
+            if worker.process.is_alive() or not graceful:
+                self._kill(worker)
+            worker.results.close()
+            worker.inbox.cancel_join_thread()
+            worker.inbox.close()
+            if not self._running:
+                continue
+            replacement = self._start_worker(worker.slot)
+            with self._lock:
+                if self._running:
+                    self._workers[worker.slot] = replacement
+                    replacement = None
+            if replacement:  # Pool stopped while we were spawning
+                self._kill(replacement)
+                replacement.results.close()
+
+    # ── bookkeeping (call with self._lock held) ──────────────────────────────
+
+    def _retire(self, worker: _Worker, reason: str, error: str = None, graceful: bool = False) -> tuple:
+        """Fail the worker's in-flight job (if any) and free its slot. Reaped later by _restart()."""
+        if worker.job and error:
+            worker.job.future.set_exception(WorkerError(error))
+            self.counters["failed"] += 1
+        worker.job = None
+        add_counters(self._retired_organizer, worker.organizer)
+        del self._workers[worker.slot]
+        self.counters["restarts"] += 1
+        print(f"[POOL] ♻️ Restarting worker {worker.slot}: {reason}")
+        return worker, graceful
+
+    def _dispatch(self):
+        for worker in self._workers.values():
+            if not self._pending:
+                return
+            if worker.ready and worker.job is None and worker.process.is_alive():
+                job = self._pending.popleft()
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                job.started = time.monotonic()
+                worker.job = job
+                worker.inbox.put((job.id, job.task, job.args))
+
+    def _handle(self, worker: _Worker, msg, retired: list):
+        if self._workers.get(worker.slot) is not worker:
+            return  # Already retired
+
+        if msg[0] == "ready":
+            worker.ready = True
+            return
+
+        _, _, _, job_id, ok, value, rss, retire, organizer = msg
+        worker.rss_mb = rss
+        worker.organizer = organizer or worker.organizer
+        worker.jobs_done += 1
+        job, worker.job = worker.job, None
+        if job and job.id == job_id:
+            if ok:
+                job.future.set_result(value)
+                self.counters["completed"] += 1
+            else:
+                job.future.set_exception(WorkerError(value))
+                self.counters["failed"] += 1
+        if retire:
+            self.counters["recycled"] += 1
+            retired.append(self._retire(worker, f"recycled after {worker.jobs_done} jobs, {rss:.0f} MB", graceful=True))
+
+    def _check_workers(self, rss: dict, dead: set, retired: list):
+        now = time.monotonic()
+        for worker in list(self._workers.values()):
+            job = worker.job
+            if worker in dead or not worker.process.is_alive():
+                self.counters["crashes"] += 1
+                retired.append(self._retire(worker, f"exited with code {worker.process.exitcode}", "Worker process crashed"))
+            elif job and now - job.started > job.timeout:
+                self.counters["timeouts"] += 1
+                retired.append(self._retire(worker, f"job exceeded {job.timeout:.0f}s deadline", f"Job timed out after {job.timeout:.0f}s"))
+            elif job and worker.slot in rss:
+                worker.rss_mb = rss[worker.slot]
+                if worker.rss_mb > self.max_rss_mb:
+                    retired.append(self._retire(worker, f"memory {worker.rss_mb:.0f} MB > {self.max_rss_mb} MB", "Worker exceeded memory limit"))
+
+    # ── supervisor thread ────────────────────────────────────────────────────
+
+    def _monitor_loop(self):
+        last_check = 0.0
+        while self._running:
+            with self._lock:
+                workers = {w.results: w for w in self._workers.values()}
+
+            # Receive outside the lock; a dead worker only breaks its own pipe
+            messages, dead = [], set()
+            if workers:
+                for conn in wait_connections(list(workers), timeout=0.2):
+                    try:
+                        while conn.poll():
+                            messages.append((workers[conn], conn.recv()))
+                    except (EOFError, OSError):
+                        dead.add(workers[conn])
+            else:
+                time.sleep(0.2)
+
+            check = time.monotonic() - last_check >= 1.0
+            rss = {}
+            if check and self.max_rss_mb:
+                busy = [w for w in workers.values() if w.job and w not in dead]
+                rss = {w.slot: _rss_mb(w.process.pid) for w in busy}
+
+            retired = []
+            with self._lock:
+                if not self._running:
+                    break
+                # Results first so a worker that just retired isn't mistaken for a crash
+                for worker, msg in messages:
+                    self._handle(worker, msg, retired)
+                if check or dead:
+                    self._check_workers(rss, dead, retired)
+                    last_check = time.monotonic()
+                self._dispatch()
+
+            if retired:
+                self._restart(retired)
+                with self._lock:
+                    self._dispatch()